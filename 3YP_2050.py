@@ -20,6 +20,7 @@ import matplotlib.pyplot as plt
 import Assets as AS
 import EnergySystem as ES
 import Market as MK
+import Profiles as PF
 import Averaging as AV
 import Plotting as PT
 import Emissions as EM
@@ -31,7 +32,7 @@ import Emissions as EM
 
 
 dt = 30/60                # 30 minute time intervals
-T = int((24 * 365) / dt)  # Number of intervals per year
+T = PF.TimeAxis(dt).T     # Number of intervals per year
 
 
 #######################################
@@ -144,9 +145,7 @@ dispatchable.append(battery_site3)
 
 # Carbon Emissions Intensities
 loss = 0.08                                                                                 # 8% loss from electricity generation to consumption 
-emission_intensity = EM.Emissions(loss)                                                     # numpy array gCO2/kWh
-emission_intensity = [i[0] for i in emission_intensity.getEmissionIntensity().tolist()]     # list gCO2/kWh
-emission_intensity = [i/1000000 for i in emission_intensity]                                # list tnCO2/kWh
+emission_intensity = EM.Emissions(loss).getEmissionIntensity().reshape(-1) / 1000000        # numpy array tnCO2/kWh
 
 
 ############################################
@@ -160,7 +159,7 @@ all_assets = non_dispatchable + dispatchable
 energy_system = ES.EnergySystem(non_dispatchable, dispatchable, dt, T)
 
 # run
-net_load, disp_load, non_disp_load = energy_system.basic_energy_balance()       
+result = energy_system.basic_energy_balance()       
 
 
 #######################################
@@ -169,82 +168,63 @@ net_load, disp_load, non_disp_load = energy_system.basic_energy_balance()
 
 
 # _means are lists of 5 nested lists, where each nested list is the averaged dailyprofile of over 1/5th of the year
-net_load = [i[0] for i in net_load.tolist()]                        # average net load
-net_load_means = AV.Averaging(net_load)
+net_load = result['net_load']                                       # average net load
 
-disp_load = [i[0] for i in disp_load.tolist()]                      # average net dispatchable load
-disp_load_means = AV.Averaging(disp_load)                   
+disp_load = result['disp_load']                                     # average net dispatchable load
 
-non_disp_load = [i[0] for i in non_disp_load.tolist()]              # average net non-dispatchable load
-non_disp_load_means = AV.Averaging(non_disp_load)
+non_disp_load = result['non_disp_load']                             # average net non-dispatchable load
 
-pv = [i[0] for i in pv_site1.getOutput(dt).tolist()]                # average domestic pv generation 
-pv_means = AV.Averaging(pv)
+pv = result[pv_site1]                                               # average domestic pv generation 
 
-sf = [i[0] for i in pv_site2.getOutput(dt).tolist()]                # average solar farm generation 
-sf_means = AV.Averaging(sf)
+sf = result[pv_site2]                                               # average solar farm generation 
 
-hydro = [i[0] for i in hydro_site1.getOutput(dt).tolist()]          # average hydro generation
-hydro_means = AV.Averaging(hydro)
+hydro = result[hydro_site1]                                         # average hydro generation
 
-dom = [i[0] for i in load_site1.getOutput(dt).tolist()]             # average domestic demand
-dom_means = AV.Averaging(dom)
+dom = result[load_site1]                                            # average domestic demand
 
-nondom = [i[0] for i in load_site2.getOutput(dt).tolist()]          # average non-domestic demand
-nondom_means = AV.Averaging(nondom)
+nondom = result[load_site2]                                         # average non-domestic demand
 
-sch = [i[0] for i in load_site7.getOutput(dt).tolist()]             # average schools electricty demand
-sch_means = AV.Averaging(sch)
+sch = result[load_site7]                                            # average schools electricty demand
 
-evd = [i[0] for i in load_site3.getOutput(dt).tolist()]             # average EV electricity demand (day)
-evd_means = AV.Averaging(evd)
+evd = result[load_site3]                                            # average EV electricity demand (day)
 
-evn = [i[0] for i in load_site9.getOutput(dt).tolist()]             # average EV electricity demand (night)
-evn_means = AV.Averaging(evn)
+evn = result[load_site9]                                            # average EV electricity demand (night)
 
-ev = [i+j for i,j in zip(evd,evn)]                                  # average total EV electricity demand
-ev_means = AV.Averaging(ev)
+ev = evd + evn                                                      # average total EV electricity demand
 
-hp1 = [i[0] for i in load_site4.getOutput().tolist()]               # average central heat pump electricity demand
-hp1_means = AV.Averaging(hp1)
+hp1 = result[load_site4]                                            # average central heat pump electricity demand
 
-hp2 = [i[0] for i in load_site5.getOutput().tolist()]               # average domestic heat pump electricity demand
-hp2_means = AV.Averaging(hp2)
+hp2 = result[load_site5]                                            # average domestic heat pump electricity demand
 
-hp3 = [i[0] for i in load_site6.getOutput().tolist()]               # average non-domestic heat pump electricity demand
-hp3_means = AV.Averaging(hp3)
+hp3 = result[load_site6]                                            # average non-domestic heat pump electricity demand
 
-hp = [i+j+k for i,j,k in zip(hp1,hp2,hp3)]                          # average total heat pump electricity demand
-hp_means = AV.Averaging(hp)
+hp = hp1 + hp2 + hp3                                                # average total heat pump electricity demand
 
-dombat = [i[0] for i in battery_site1.getOutput(net_load).tolist()] # average domestic battery storage
-dombat_means = AV.Averaging(dombat)
+dombat = result[battery_site1]                                      # average domestic battery storage
 
-combat = [i[0] for i in battery_site2.getOutput(net_load).tolist()] # average community battery storage
-combat_means = AV.Averaging(combat)
+combat = result[battery_site2]                                      # average community battery storage
 
-v2g = [i[0] for i in battery_site3.getOutput(net_load).tolist()]    # average V2G battery storage
-v2g_means = AV.Averaging(v2g)
+v2g = result[battery_site3]                                         # average V2G battery storage
 
-gross_gen = [i+j+k for i,j,k in zip(hydro,pv,sf)]                   # average gross renewable generation
-gross_gen_means = AV.Averaging(gross_gen)
+gross_gen = hydro + pv + sf                                         # average gross renewable generation
 
-gross_load = [i+j+k+l+m for i,j,k,l,m in zip(dom,nondom,sch,ev,hp)] # average gross demand           
-gross_load_means = AV.Averaging(gross_load)
+gross_load = dom + nondom + sch + ev + hp                           # average gross demand           
 
-current = [g+h+i+j-k for g,h,i,j,k in zip(sch,ev,dom,nondom,hydro)] # average net load without energy system (EV demand in 2050 included)
-current_means = AV.Averaging(current)
+current = sch + ev + dom + nondom - hydro                           # average net load without energy system (EV demand in 2050 included)
 
-current_2 = [h+i+j-k for h,i,j,k in zip(sch,dom,nondom,hydro)]      # average net load without energy system (no EV demand included)
-current_2_means = AV.Averaging(current_2)
+current_2 = sch + dom + nondom - hydro                              # average net load without energy system (no EV demand included)
 
-grid_imports = []                                                   # when net load is positive, kWh are imported to Kennington
-for i in net_load:
-    if i > 0:
-        grid_imports.append(i)
-    else:
-        grid_imports.append(0)
-grid_imports_means = AV.Averaging(grid_imports)
+grid_imports = result.grid_imports                                  # when net load is positive, kWh are imported to Kennington
+
+# daily averages for each quintile of every series, in one pass
+(net_load_means, disp_load_means, non_disp_load_means, pv_means, sf_means,
+ hydro_means, dom_means, nondom_means, sch_means, evd_means, evn_means,
+ ev_means, hp1_means, hp2_means, hp3_means, hp_means, dombat_means,
+ combat_means, v2g_means, gross_gen_means, gross_load_means, current_means,
+ current_2_means, grid_imports_means) = AV.batchAveraging([
+        net_load, disp_load, non_disp_load, pv, sf, hydro, dom, nondom, sch,
+        evd, evn, ev, hp1, hp2, hp3, hp, dombat, combat, v2g, gross_gen,
+        gross_load, current, current_2, grid_imports])
 
 
 #######################################
@@ -314,11 +294,11 @@ x0 = emission_intensity                                     # carbon emission in
 y0 = net_load                                               # with energy system, net load (kWh)
 z0 = current                                                # without energy system, net load (kWh)  
                                  
-emissions = [a*b for a,b in zip(y0,x0)]                     # with energy system, emissions (tnCO2)
-emissions_means = AV.Averaging(emissions)                   # daily averages for each quintile
+emissions, previous_emissions = EM.Emissions(loss).getEmissions(
+        np.stack([y0, z0]), profile=True)['profile']       # with/without energy system, emissions (tnCO2)
                                      
-previous_emissions = [a*b for a,b in zip(z0,x0)]            # without energy system, emissions (tnCO2)
-previous_emissions_means = AV.Averaging(previous_emissions) # daily averages for each quintile
+# daily averages for each quintile, in one pass
+emissions_means, previous_emissions_means = AV.batchAveraging([emissions, previous_emissions])
 
 
 # plot emmissions intensity over 2050
@@ -328,7 +308,7 @@ x_axis = pd.date_range('2050' + '-01-01', periods = 17520, freq= '0.5H')
 myFmt = mdates.DateFormatter('%B')                          # format the times into month format
 plt.gcf().autofmt_xdate()                                   # automatic rotation of the axis plots
 
-axA.plot(x_axis, emission_intensity, 'k')
+PT.plotSeries(axA, x_axis, emission_intensity, 'k')
 axA.set_ylabel('tnCO2/kWh')
 axA.set_title('Emissions Intensity')
 axA.xaxis.set_major_formatter(myFmt)                        # apply B format to the x axis data
@@ -342,7 +322,7 @@ x_axis = pd.date_range('2050' + '-01-01', periods = 17520, freq= '0.5H')
 myFmt = mdates.DateFormatter('%B')                          # format the times into month format
 plt.gcf().autofmt_xdate()                                   # automatic rotation of the axis plots
 
-axB.plot(x_axis, net_load, 'k')
+PT.plotSeries(axB, x_axis, net_load, 'k')
 axB.set_ylabel('Net Load (kWh)')
 axB.set_title('New Energy System Net Load')
 axB.xaxis.set_major_formatter(myFmt)                        # apply B format to the x axis data
@@ -356,7 +336,7 @@ x_axis = pd.date_range('2050' + '-01-01', periods = 17520, freq= '0.5H')
 myFmt = mdates.DateFormatter('%B')                          # format the times into month format
 plt.gcf().autofmt_xdate()                                   # automatic rotation of the axis plots
 
-axE.plot(x_axis, current, 'k')
+PT.plotSeries(axE, x_axis, current, 'k')
 axE.set_ylabel('Net Load (kWh)')
 #axE.set_title('Current Situation Net Load')
 axE.xaxis.set_major_formatter(myFmt)                        # apply B format to the x axis data
@@ -371,7 +351,7 @@ myFmt = mdates.DateFormatter('%B')                          # format the times i
 plt.gcf().autofmt_xdate()                                   # automatic rotation of the axis plots
 plt.tick_params(labelsize=18)
 
-axC.plot(x_axis, emissions, 'k')
+PT.plotSeries(axC, x_axis, emissions, 'k')
 axC.set_ylabel('Net Emissions (tnCO2)', size=18)
 axC.set_ylim([-3,2])
 axC.set_title('New Energy System Net Emissions')
@@ -387,7 +367,7 @@ myFmt = mdates.DateFormatter('%B')                          # format the times i
 plt.gcf().autofmt_xdate()                                   # automatic rotation of the axis plots
 plt.tick_params(labelsize=18)
 
-axF.plot(x_axis, previous_emissions, 'k')
+PT.plotSeries(axF, x_axis, previous_emissions, 'k')
 axF.set_ylabel('Net Emissions (tnCO2)', size=18)
 axF.set_ylim([-3,2])
 #axF.set_title('Current Situation Net Emissions')
@@ -455,7 +435,7 @@ print('New Energy System: Proportion of time in which Kennington draws from the
 print("")
 
 occurance3 = []
-net_load_2 = [i-j for i,j in zip(gross_load,gross_gen)]
+net_load_2 = gross_load - gross_gen
 for load in net_load_2:
     if load > 0:
         occurance3.append(1)
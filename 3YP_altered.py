@@ -20,6 +20,7 @@ from pandas import Timestamp
 import Assets as AS
 import EnergySystem as ES
 import Market as MK
+import Profiles as PF
 
 
 #######################################
@@ -28,7 +29,7 @@ import Market as MK
 
 
 dt = 30/60  # 30 minute time intervals
-T = int((24 * 365) / dt)  # Number of intervals per year
+T = PF.TimeAxis(dt).T     # Number of intervals per year
 
 
 #######################################
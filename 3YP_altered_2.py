@@ -20,6 +20,7 @@ import matplotlib.pyplot as plt
 import Assets as AS
 import EnergySystem as ES
 import Market as MK
+import Profiles as PF
 import Averaging as AV
 import Plotting as PT
 import Emissions as EM
@@ -31,7 +32,7 @@ import Emissions as EM
 
 
 dt = 30/60                # 30 minute time intervals
-T = int((24 * 365) / dt)  # Number of intervals per year
+T = PF.TimeAxis(dt).T     # Number of intervals per year
 
 
 #######################################
@@ -139,28 +140,25 @@ sold_daily = ES.E_to_dailyE(sold, dt) / 100            # convert to pounds
 
 # _means are lists of 5 nested lists, where each nested list is an averaged profile of over 1/5th of the year
 net_load = [i[0] for i in net_load.tolist()]                        # average net load
-net_load_means = AV.Averaging(net_load)
 
 disp_load = [i[0] for i in disp_load.tolist()]                      # average net dispatchable load
-disp_load_means = AV.Averaging(disp_load)                   
 
 non_disp_load = [i[0] for i in non_disp_load.tolist()]              # average net non-dispatchable load
-non_disp_load_means = AV.Averaging(non_disp_load)
 
 pv = [i[0] for i in pv_site1.getOutput(dt).tolist()]                # average pv generation 
-pv_means = AV.Averaging(pv)
 
 sf = [i[0] for i in pv_site2.getOutput(dt).tolist()]                # average solar farm generation 
-sf_means = AV.Averaging(sf)
 
 hydro = [i[0] for i in hydro_site1.getOutput(dt).tolist()]          # average hydro generation
-hydro_means = AV.Averaging(hydro)
 
 dom = [i[0] for i in load_site1.getOutput(dt).tolist()]             # average domestic demand
-dom_means = AV.Averaging(dom)
 
 nondom = [i[0] for i in load_site2.getOutput(dt).tolist()]          # average non-domestic demand
-nondom_means = AV.Averaging(nondom)
+
+# daily averages for each quintile of every series, in one pass
+(net_load_means, disp_load_means, non_disp_load_means, pv_means, sf_means,
+ hydro_means, dom_means, nondom_means) = AV.batchAveraging([
+        net_load, disp_load, non_disp_load, pv, sf, hydro, dom, nondom])
 
 #ev = [i[0] for i in load_site3.getOutput(dt).tolist()]              # average EV electricity demand
 #ev_means = AV.Averaging(ev)
@@ -169,13 +167,13 @@ nondom_means = AV.Averaging(nondom)
 #hp_means = AV.Averaging(hp)
 
 dombat = [i[0] for i in battery_site1.getOutput(net_load).tolist()] # average domestic battery storage
-dombat_means = AV.Averaging(dombat)
 
 combat = [i[0] for i in battery_site2.getOutput(net_load).tolist()] # average community battery storage
-combat_means = AV.Averaging(combat)
 
 gross_gen = [i+j+k for i,j,k in zip(hydro,pv,sf)]
-gross_gen_means = AV.Averaging(gross_gen)
+
+# daily averages for each quintile of every series, in one pass
+(dombat_means, combat_means, gross_gen_means) = AV.batchAveraging([dombat, combat, gross_gen])
 
 
 #######################################
@@ -6,14 +6,29 @@
 Adapted from UoO EPG's energy management framework.
 Authors: Avinash Vijay, Scot Wheeler, Mathew Hedges,
 Minnie Karanjavala, Ravi Kohli, Steven Jones
+
+The greedy battery kernel runs in pure Python or, with numba installed,
+compiled. Importing and loading numba (~0.4 s) costs about as much as
+1.5 million pure Python intervals (~5 ms per year of half hours), so by
+default a call is compiled only if it dispatches at least JIT_MIN
+intervals (batteries x intervals). Set the KENNINGTON_JIT environment
+variable to 1 or 0 to always or never compile, or pass jit= per call;
+the choice never depends on earlier calls.
 """
 
 __version__ = '0.5'
 
 # import modules
-import pandas as pd
+import os
+
 import numpy as np
-from datetime import timedelta
+
+import Profiles as PF
+
+
+# asset attributes holding the unit count, which scales the unit output
+COUNTS = ('pvInstallations', 'pvPanels', 'nHouseholds', 'nBusinesses',
+          'nCars', 'nPumps', 'nUsers')
 
 
 class Non_Dispatchable:
@@ -25,6 +40,41 @@ class Non_Dispatchable:
         self.lifetime = 25
         self.genFiT = 5.24 # feed in tariff p/kWh
 
+    def getKey(self):
+        """
+        Return a hashable key of the asset's scalar parameters, used to
+        detect parameter changes between energy balances.
+        """
+        return tuple(sorted((name, value) for name, value in vars(self).items()
+                            if isinstance(value, (int, float, str, np.number))))
+
+    def getUnitKey(self):
+        """
+        Return the parameter key without the unit count, which changes
+        the output but not the unit output.
+        """
+        return tuple(item for item in self.getKey() if item[0] not in COUNTS)
+
+    def iterOutput(self, dt, chunk, T=None):
+        """
+        Yield the output in chunks for a streamed run
+
+        Parameters
+        ----------
+        dt : float or TimeAxis
+            Time interval (hours), the year long output is computed once.
+        chunk : int
+            Intervals per chunk, the last chunk may be shorter.
+        T : int
+            Intervals in the run, the year repeats for longer runs.
+
+        Yields
+        ------
+        (n,) numpy array
+        """
+        axis = PF.getTimeAxis(PF.getTimeAxis(dt).dt)            # year long axis of the same step
+        return PF.iterChunks(self.getOutput(axis).reshape(-1), chunk, T)
+
 
 class Dispatchable:
     """Dispatchable asset base class"""
@@ -35,6 +85,14 @@ class Dispatchable:
         self.lifetime = 25
         self.genFiT = 5.24 # feed in tariff p/kWh
 
+    def getKey(self):
+        """
+        Return a hashable key of the asset's scalar parameters, used to
+        detect parameter changes between energy balances.
+        """
+        return tuple(sorted((name, value) for name, value in vars(self).items()
+                            if isinstance(value, (int, float, str, np.number))))
+
 
 class hydroAsset(Non_Dispatchable):
     """
@@ -65,12 +123,12 @@ class hydroAsset(Non_Dispatchable):
         self.profile = self.hydroProfile()
         
     def hydroProfile(self):
-        df = pd.read_csv(self.profile_filepath, usecols=[1], 
-                         parse_dates=True, dayfirst=True) # kW
-        #print('hydro data coming...')
-        #print(df.info())
-        #print(df.head(50))
-        return df 
+        profile = PF.getProfile(self.profile_filepath, usecols=[1]) # kW
+        return profile
+
+    def alignedProfile(self, dt):
+        """Return the kW profile averaged onto the time axis of dt"""
+        return PF.getTimeAxis(dt).getProfile(self.profile_filepath, [1], kind='mean')
 
     def getOutput(self, dt):
         """
@@ -78,20 +136,41 @@ class hydroAsset(Non_Dispatchable):
 
         Parameters
         ----------
-        dt : float
-            Time interval (hours)
+        dt : float or TimeAxis
+            Time interval (hours), or the time axis to align the profile to
 
         Returns
         -------
         Sandford Hydro output : numpy array
         """
-        gen = self.profile.values # this will return the 365*48 values in the hydro profile as a numpy array 
-        output = gen * dt # kWh
+        axis = PF.getTimeAxis(dt)
+        gen = self.alignedProfile(axis) # the hydro profile as a numpy array on the time axis
+        output = gen * axis.dt # kWh
         self.output = output
         #print('hydro output coming...')
         #print(output)
         return output
 
+    def getUnitOutput(self, dt):
+        """
+        Return Sandford Hydro output of a single unit
+
+        Parameters
+        ----------
+        dt : float or TimeAxis
+            Time interval (hours), or the time axis to align the profile to
+
+        Returns
+        -------
+        Sandford Hydro output per unit : numpy array
+        """
+        axis = PF.getTimeAxis(dt)
+        return self.alignedProfile(axis) * axis.dt # kWh
+
+    def getUnits(self):
+        """Return the number of units scaling the unit output"""
+        return 1
+
 
 class pvAsset(Non_Dispatchable):
     """
@@ -132,12 +211,15 @@ class pvAsset(Non_Dispatchable):
         -------
         kW/kWp solar profile
         """
-        df = pd.read_csv(self.profile_filepath, index_col=0,
-                         parse_dates=True, dayfirst=True)  # kW/kWp
-        #print('original solar data coming...')
-        #print(df.info())
-        #print(df.head(50))
-        return df  
+        return PF.getProfile(self.profile_filepath, usecols=[1])  # kW/kWp
+
+    def alignedProfile(self, dt):
+        """
+        Return the kW/kWp profile on the time axis of dt, interpolated
+        from the hourly samples
+        """
+        return PF.getTimeAxis(dt).getProfile(self.profile_filepath, [1], kind='interp',
+                                             timestamped=True)
 
     def getOutput(self, dt):
         """
@@ -145,28 +227,40 @@ class pvAsset(Non_Dispatchable):
 
         Parameters
         ----------
-        dt : float
-            Time interval (hours)
+        dt : float or TimeAxis
+            Time interval (hours), or the time axis to align the profile to
 
         Returns
         -------
         PV output : numpy array
         """
-        cfHH = self.cf.resample('0.5H').mean()
-        # adding a missing point at the end
-        cfHH = cfHH.append(pd.DataFrame({cfHH.columns[0]: np.nan},
-                                      index=[(cfHH.index[-1] +
-                                              timedelta(minutes=30))]))
-        cfHH = cfHH.interpolate()
-        #print('modified solar data coming...')
-        #print(cfHH.info())
-        #print(cfHH.head(50))
-        output = cfHH.values * self.pvCapacity * self.pvInstallations * dt # kWh
+        axis = PF.getTimeAxis(dt)
+        output = self.alignedProfile(axis) * self.pvCapacity * self.pvInstallations * axis.dt # kWh
         self.output = output
         #print('solar output coming...')
         #print(output)
         return output
 
+    def getUnitOutput(self, dt):
+        """
+        Return PV output of a single unit
+
+        Parameters
+        ----------
+        dt : float or TimeAxis
+            Time interval (hours), or the time axis to align the profile to
+
+        Returns
+        -------
+        PV output per unit : numpy array
+        """
+        axis = PF.getTimeAxis(dt)
+        return self.alignedProfile(axis) * self.pvCapacity * axis.dt # kWh
+
+    def getUnits(self):
+        """Return the number of units scaling the unit output"""
+        return self.pvInstallations
+
 
 class sfAsset(Non_Dispatchable):
     """
@@ -207,12 +301,15 @@ class sfAsset(Non_Dispatchable):
         -------
         kW/kWp solar farm profile
         """
-        df = pd.read_csv(self.profile_filepath, index_col=0,
-                         parse_dates=True, dayfirst=True)  # kW/kWp
-        #print('original solar farm data coming...')
-        #print(df.info())
-        #print(df.head(50))
-        return df  
+        return PF.getProfile(self.profile_filepath, usecols=[1])  # kW/kWp
+
+    def alignedProfile(self, dt):
+        """
+        Return the kW/kWp profile on the time axis of dt, interpolated
+        from the hourly samples
+        """
+        return PF.getTimeAxis(dt).getProfile(self.profile_filepath, [1], kind='interp',
+                                             timestamped=True)
 
     def getOutput(self, dt):
         """
@@ -220,28 +317,40 @@ class sfAsset(Non_Dispatchable):
 
         Parameters
         ----------
-        dt : float
-            Time interval (hours)
+        dt : float or TimeAxis
+            Time interval (hours), or the time axis to align the profile to
 
         Returns
         -------
         Solar farm output : numpy array
         """
-        cfHH = self.cf.resample('0.5H').mean()
-        # adding a missing point at the end
-        cfHH = cfHH.append(pd.DataFrame({cfHH.columns[0]: np.nan},
-                                      index=[(cfHH.index[-1] +
-                                              timedelta(minutes=30))]))
-        cfHH = cfHH.interpolate()
-        #print('modified solar farm data coming...')
-        #print(cfHH.info())
-        #print(cfHH.head(50))
-        output = cfHH.values * self.pvCapacity * self.pvPanels * self.degradation_factor * dt # kWh
+        axis = PF.getTimeAxis(dt)
+        output = self.alignedProfile(axis) * self.pvCapacity * self.pvPanels * self.degradation_factor * axis.dt # kWh
         self.output = output
         #print('solar farm output coming...')
         #print(output)
         return output
 
+    def getUnitOutput(self, dt):
+        """
+        Return solar farm output of a single unit
+
+        Parameters
+        ----------
+        dt : float or TimeAxis
+            Time interval (hours), or the time axis to align the profile to
+
+        Returns
+        -------
+        Solar farm output per unit : numpy array
+        """
+        axis = PF.getTimeAxis(dt)
+        return self.alignedProfile(axis) * self.pvCapacity * self.degradation_factor * axis.dt # kWh
+
+    def getUnits(self):
+        """Return the number of units scaling the unit output"""
+        return self.pvPanels
+
 
 class loadAsset(Non_Dispatchable):
     """
@@ -264,11 +373,12 @@ class loadAsset(Non_Dispatchable):
         self.profile = self.loadProfile()
         
     def loadProfile(self):
-        df = pd.read_csv(self.profile_filepath, usecols=[1]) # kW
-        #print('domestic load data coming...')
-        #print(df.info())
-        #print(df.head(50))
-        return df
+        profile = PF.getProfile(self.profile_filepath, usecols=[1]) # kW
+        return profile
+
+    def alignedProfile(self, dt):
+        """Return the kW profile averaged onto the time axis of dt"""
+        return PF.getTimeAxis(dt).getProfile(self.profile_filepath, [1], kind='mean')
         
     def getOutput(self, dt):
         """
@@ -276,20 +386,41 @@ class loadAsset(Non_Dispatchable):
 
         Parameters
         ----------
-        dt : float
-            Time interval (hours)
+        dt : float or TimeAxis
+            Time interval (hours), or the time axis to align the profile to
 
         Returns
         -------
         Domestic demand : numpy array
         """
-        dem = self.profile.values   # this will return the 365*48 values in the dom load profile as a numpy array 
-        output = dem * self.nHouseholds * dt # kWh 
+        axis = PF.getTimeAxis(dt)
+        dem = self.alignedProfile(axis)   # the dom load profile as a numpy array on the time axis
+        output = dem * self.nHouseholds * axis.dt # kWh
         self.output = output
         #print('domestic load output coming...')
         #print(output)
         return output
 
+    def getUnitOutput(self, dt):
+        """
+        Return domestic demand output of a single unit
+
+        Parameters
+        ----------
+        dt : float or TimeAxis
+            Time interval (hours), or the time axis to align the profile to
+
+        Returns
+        -------
+        Domestic demand output per unit : numpy array
+        """
+        axis = PF.getTimeAxis(dt)
+        return self.alignedProfile(axis) * axis.dt # kWh
+
+    def getUnits(self):
+        """Return the number of units scaling the unit output"""
+        return self.nHouseholds
+
 
 class ndAsset(Non_Dispatchable):
     """
@@ -316,11 +447,12 @@ class ndAsset(Non_Dispatchable):
         self.profile = self.ndProfile()
         
     def ndProfile(self):
-        df = pd.read_csv(self.profile_filepath, usecols=[1]) # kW
-        #print('non-domestic load data coming...')
-        #print(df.info())
-        #print(df.head(50))
-        return df
+        profile = PF.getProfile(self.profile_filepath, usecols=[1]) # kW
+        return profile
+
+    def alignedProfile(self, dt):
+        """Return the kW profile averaged onto the time axis of dt"""
+        return PF.getTimeAxis(dt).getProfile(self.profile_filepath, [1], kind='mean')
         
     def getOutput(self, dt):
         """
@@ -328,20 +460,41 @@ class ndAsset(Non_Dispatchable):
 
         Parameters
         ----------
-        dt : float
-            Time interval (hours)
+        dt : float or TimeAxis
+            Time interval (hours), or the time axis to align the profile to
 
         Returns
         -------
         Non-domestic demand : numpy array
         """
-        dem = self.profile.values # this will return the 365*48 values in the nondom load profile as a numpy array 
-        output = dem * self.nBusinesses * dt # kWh
+        axis = PF.getTimeAxis(dt)
+        dem = self.alignedProfile(axis) # the nondom load profile as a numpy array on the time axis
+        output = dem * self.nBusinesses * axis.dt # kWh
         self.output = output
         #print('non-domestic load output coming...')
         #print(output)
         return output
-    
+
+    def getUnitOutput(self, dt):
+        """
+        Return non-domestic demand output of a single unit
+
+        Parameters
+        ----------
+        dt : float or TimeAxis
+            Time interval (hours), or the time axis to align the profile to
+
+        Returns
+        -------
+        Non-domestic demand output per unit : numpy array
+        """
+        axis = PF.getTimeAxis(dt)
+        return self.alignedProfile(axis) * axis.dt # kWh
+
+    def getUnits(self):
+        """Return the number of units scaling the unit output"""
+        return self.nBusinesses
+
 
 class evAsset(Non_Dispatchable):
     """
@@ -366,11 +519,12 @@ class evAsset(Non_Dispatchable):
         self.profile = self.evProfile()
         
     def evProfile(self):
-        df = pd.read_csv(self.profile_filepath, usecols=[1]) # kW
-        # print('electric vehicle load data coming...')
-        # print(df.info())
-        # print(df.head(50))
-        return df
+        profile = PF.getProfile(self.profile_filepath, usecols=[1]) # kW
+        return profile
+
+    def alignedProfile(self, dt):
+        """Return the kW profile averaged onto the time axis of dt"""
+        return PF.getTimeAxis(dt).getProfile(self.profile_filepath, [1], kind='mean')
         
     def getOutput(self, dt):
         """
@@ -378,21 +532,42 @@ class evAsset(Non_Dispatchable):
 
         Parameters
         ----------
-        dt : float
-           Time interval (hours)
+        dt : float or TimeAxis
+           Time interval (hours), or the time axis to align the profile to
 
         Returns
         -------
         Electric vehicle electricity demand : numpy array
         """
 
-        ev = self.profile.values
-        output = ev * self.nCars * dt # kWh
+        axis = PF.getTimeAxis(dt)
+        ev = self.alignedProfile(axis)
+        output = ev * self.nCars * axis.dt # kWh
         self.output = output
         # print('electric vehicle load output coming...')
         # print(output)
         return output
-    
+
+    def getUnitOutput(self, dt):
+        """
+        Return electric vehicle demand output of a single unit
+
+        Parameters
+        ----------
+        dt : float or TimeAxis
+            Time interval (hours), or the time axis to align the profile to
+
+        Returns
+        -------
+        Electric vehicle demand output per unit : numpy array
+        """
+        axis = PF.getTimeAxis(dt)
+        return self.alignedProfile(axis) * axis.dt # kWh
+
+    def getUnits(self):
+        """Return the number of units scaling the unit output"""
+        return self.nCars
+
 
 class hpAsset(Non_Dispatchable):
     """
@@ -415,33 +590,299 @@ class hpAsset(Non_Dispatchable):
         self.profile = self.hpProfile()
         
     def hpProfile(self):
-        df = pd.read_csv(self.profile_filepath, usecols=[2]) # kWh
-        #print('heat pump load data coming...')
-        #print(df.info())
-        #print(df.head(50))
-        return df
+        profile = PF.getProfile(self.profile_filepath, usecols=[2]) # kWh
+        return profile
+
+    def alignedProfile(self, dt):
+        """Return the kWh per interval profile summed onto the time axis of dt"""
+        return PF.getTimeAxis(dt).getProfile(self.profile_filepath, [2], kind='sum')
         
-    def getOutput(self):
+    def getOutput(self, dt=0.5):
         """
         Returns heat pump electricity demand
 
         Parameters
         ----------
-        dt : float
-            Time interval (hours)
+        dt : float or TimeAxis
+            Time interval (hours), or the time axis to align the profile to
 
         Returns
         -------
         Heat pump electricity demand : numpy array
         """
-        output = self.nPumps * self.profile.values # already in kWh
+        output = self.nPumps * self.alignedProfile(dt) # already in kWh
         self.output = output
         #print('heat pump load output coming...')
         #print(output)
         return output
 
+    def getUnitOutput(self, dt):
+        """
+        Return heat pump demand output of a single unit
 
-class PracticalBatteryAsset1(Dispatchable):
+        Parameters
+        ----------
+        dt : float or TimeAxis
+            Time interval (hours), or the time axis to align the profile to
+
+        Returns
+        -------
+        Heat pump demand output per unit : numpy array
+        """
+        return self.alignedProfile(dt) # already in kWh
+
+    def getUnits(self):
+        """Return the number of units scaling the unit output"""
+        return self.nPumps
+
+
+def _dispatch(net_load, output, soc, capacity, power, eff, soc0):
+    """
+    Greedy charge/discharge loop shared by every battery asset. Works on
+    plain 1-D buffers (lists, or float arrays under the JIT) so no numpy
+    scalars are boxed per step. Same arithmetic as the original loop, so
+    results are identical; soc is left untouched where net_load is NaN.
+    The battery starts at soc0, full for a whole run.
+    """
+    inv = 1/eff
+    prev = soc0
+    for j in range(len(net_load)):
+        x = net_load[j]
+        if x > 0:  # use battery
+            out = eff*prev
+            if x < out:
+                out = x
+            if power < out:
+                out = power
+            output[j] = out
+            prev = prev - inv*out
+            soc[j] = prev
+        elif x < 0:  # charge battery
+            out = - inv * (capacity - prev)
+            if x > out:
+                out = x
+            if -power > out:
+                out = -power
+            output[j] = out
+            prev = prev - eff*out
+            soc[j] = prev
+        elif x == 0:  # do nothing
+            soc[j] = prev
+        else:
+            prev = soc[j]
+
+
+JIT_MIN = 1000000  # intervals dispatched in one call before numba is worth importing
+JIT = {'1': True, '0': False}.get(os.environ.get('KENNINGTON_JIT'))  # None: by JIT_MIN
+
+_jit_dispatch = None  # compiled kernel, False without numba
+
+
+def useJit(size, jit=None):
+    """
+    Whether a dispatch of size intervals runs the compiled kernel: jit if
+    given, else the KENNINGTON_JIT setting, else size >= JIT_MIN.
+    """
+    if jit is None:
+        jit = JIT
+    if jit is None:
+        jit = size >= JIT_MIN
+    return bool(jit)
+
+
+def _jitKernel(size, jit=None):
+    """
+    Return the numba compiled battery kernel, or None for pure Python
+    (see useJit, or numba not installed).
+    """
+    global _jit_dispatch
+    if not useJit(size, jit):
+        return None
+    if _jit_dispatch is None:
+        try:
+            import numba
+        except ImportError:
+            _jit_dispatch = False
+        else:
+            _jit_dispatch = numba.njit(cache=True)(_dispatch)
+    return _jit_dispatch or None
+
+
+def batteryDispatch(net_load, capacity, power, eff, soc, soc0=None, jit=None):
+    """
+    Battery control of charging/discharging in response to net load.
+
+    Parameters
+    ----------
+    net_load : array_like
+        The net load, (load - nondispatchable gen), (T,) or (T, 1).
+    capacity : float
+        Battery capacity, kWh.
+    power : float
+        Maximum energy per interval, kWh.
+    eff : float
+        Charging/discharging efficiency between 0-1.
+    soc : numpy array
+        State of charge buffer of at least T values, filled in place.
+    soc0 : float
+        State of charge before the first interval, kWh, full by default.
+        A streamed run passes the terminal soc of the previous chunk.
+    jit : bool
+        Run the compiled kernel, see useJit.
+
+    Returns
+    -------
+    Battery energy use profile : numpy array (T, 1)
+    """
+    net = np.ascontiguousarray(net_load, dtype=float).reshape(-1)
+    T = len(net)
+    soc0 = float(capacity if soc0 is None else soc0)
+    kernel = _jitKernel(T, jit)
+    if kernel is not None and soc.dtype == float and soc.flags.c_contiguous:
+        output = np.zeros(T)
+        kernel(net, output, soc, float(capacity), float(power),
+                      float(eff), soc0)
+    else:
+        output = [0.0] * T
+        soc_list = soc[:T].tolist()
+        _dispatch(net.tolist(), output, soc_list, float(capacity),
+                  float(power), float(eff), soc0)
+        soc[:T] = soc_list
+        output = np.array(output)
+    return output.reshape(T, 1)
+
+
+def batchDispatch(net_load, capacity, power, eff, jit=None):
+    """
+    Battery control for N parameter sets in a single pass through time.
+
+    The greedy rule of batteryDispatch is applied to all N batteries at
+    once, with the N states of charge updated as one vector per interval
+    (or row by row through the compiled kernel when numba is installed).
+    Results match N separate runs of freshly built batteries.
+
+    Parameters
+    ----------
+    net_load : array_like
+        The net load, either (N, T) or a (T,) profile shared by all N.
+    capacity : array_like
+        Battery capacities, kWh, length N.
+    power : array_like
+        Maximum energy per interval, kWh, length N.
+    eff : array_like
+        Charging/discharging efficiencies between 0-1, length N.
+    jit : bool
+        Run the compiled kernel, see useJit; the vectorised numpy pass
+        is used otherwise.
+
+    Returns
+    -------
+    output : numpy array
+        (N, T) battery energy use profiles.
+    soc : numpy array
+        (N, T) states of charge.
+    """
+    capacity, power, eff = np.broadcast_arrays(
+            np.asarray(capacity, dtype=float), np.asarray(power, dtype=float),
+            np.asarray(eff, dtype=float))
+    capacity = capacity.reshape(-1)
+    power = power.reshape(-1)
+    eff = eff.reshape(-1)
+    N = len(capacity)
+    net = np.asarray(net_load, dtype=float)
+    if net.ndim == 2 and net.shape[1] == 1:
+        net = net[:, 0]
+    T = net.shape[-1]
+
+    kernel = _jitKernel(N * T, jit)
+    if kernel is not None:
+        net = np.broadcast_to(net, (N, T))
+        output = np.zeros((N, T))
+        soc = np.empty((N, T))
+        for i in range(N):
+            soc[i] = capacity[i]
+            kernel(np.ascontiguousarray(net[i]), output[i], soc[i],
+                          capacity[i], power[i], eff[i], capacity[i])
+        return output, soc
+
+    # step through time once, columns of (T, N) buffers hold all N batteries
+    if net.ndim == 2:
+        net = np.ascontiguousarray(np.broadcast_to(net, (N, T)).T)
+    output = np.zeros((T, N))
+    soc = np.empty((T, N))
+    inv = 1/eff
+    prev = capacity.copy()
+    for j in range(T):
+        x = net[j]
+        use = x > 0
+        charge = x < 0
+        out = np.where(use, np.minimum(np.minimum(power, x), eff*prev),
+                       np.maximum(np.maximum(-power, x),
+                                  - inv * (capacity - prev)))
+        out = np.where(use | charge, out, 0.0)
+        prev = np.where(use, prev - inv*out,
+                        np.where(charge, prev - eff*out,
+                                 np.where(x == 0, prev, capacity)))
+        output[j] = out
+        soc[j] = prev
+    output = output.T
+    soc = soc.T
+    return output, soc
+
+
+class BatteryAsset(Dispatchable):
+    """
+    Battery asset base class
+
+    Subclasses set capacity (kWh), power (kWh per interval), eff and a
+    (T,) soc array in their constructor.
+    """
+    def getOutput(self, net_load):
+        """
+        Battery control of charging/discharging in response to net load.
+
+        Parameters
+        ----------
+        net_load : numpy array
+            The net load, (load - nondispatchable gen).
+
+        Returns
+        -------
+        Battery energy use profile : numpy array
+        """
+        output = batteryDispatch(net_load, self.capacity, self.power,
+                                 self.eff, self.soc)
+        self.output = output
+        return output
+
+    def getChunkOutput(self, net_load, soc0, jit=None):
+        """
+        Dispatch one chunk of a streamed run, leaving self.soc untouched
+
+        Parameters
+        ----------
+        net_load : numpy array
+            The net load of the chunk.
+        soc0 : float
+            State of charge at the start of the chunk, kWh.
+        jit : bool
+            Run the compiled kernel, see useJit. A streamed run decides
+            once for the whole run rather than per chunk.
+
+        Returns
+        -------
+        output : numpy array
+            (n, 1) battery energy use profile of the chunk.
+        soc : numpy array
+            (n,) states of charge, soc[-1] starts the next chunk.
+        """
+        soc = np.full(len(net_load), float(soc0))
+        output = batteryDispatch(net_load, self.capacity, self.power,
+                                 self.eff, soc, soc0, jit)
+        return output, soc
+
+
+class PracticalBatteryAsset1(BatteryAsset):
     """
     2nd life EV battery asset class
 
@@ -475,41 +916,8 @@ class PracticalBatteryAsset1(Dispatchable):
         self.soc = np.ones(T) * self.capacity
         self.install_cost = install_cost * 100  # p/kWh
 
-    def getOutput(self, net_load):
-        """
-        Battery control of charging/discharging in response to net load.
-
-        Parameters
-        ----------
-        net_load : numpy array
-            The net load, (load - nondispatchable gen).
-
-        Returns
-        -------
-        Battery energy use profile : numpy array
-        """
-        T = len(net_load)
-        output = np.zeros((T, 1))
-        for j in range(len(net_load)):
-            if j == 0:
-                soc = self.capacity
-            else:
-                soc = self.soc[j-1]
-
-            if net_load[j] > 0:  # use battery
-                output[j] = min(self.power, net_load[j], self.eff*soc)
-                self.soc[j] = soc - (1/self.eff)*output[j]
-            elif net_load[j] < 0:  # charge battery
-                output[j] = max(-self.power, net_load[j],
-                                - (1/self.eff) * (self.capacity - soc))
-                self.soc[j] = soc - self.eff * output[j]
-            elif net_load[j] == 0:  # do nothing
-                self.soc[j] = soc
-        self.output = output
-        return output
-
 
-class PracticalBatteryAsset2(Dispatchable):
+class PracticalBatteryAsset2(BatteryAsset):
     """
     Community battery asset class
 
@@ -543,41 +951,8 @@ class PracticalBatteryAsset2(Dispatchable):
         self.soc = np.ones(T) * self.capacity
         self.install_cost = install_cost * 100  # p/kWh
 
-    def getOutput(self, net_load):
-        """
-        Battery control of charging/discharging in response to net load.
-
-        Parameters
-        ----------
-        net_load : numpy array
-            The net load, (load - nondispatchable gen).
-
-        Returns
-        -------
-        Battery energy use profile : numpy array
-        """
-        T = len(net_load)
-        output = np.zeros((T, 1))
-        for j in range(len(net_load)):
-            if j == 0:
-                soc = self.capacity
-            else:
-                soc = self.soc[j-1]
-
-            if net_load[j] > 0:  # use battery
-                output[j] = min(self.power, net_load[j], self.eff*soc)
-                self.soc[j] = soc - (1/self.eff)*output[j]
-            elif net_load[j] < 0:  # charge battery
-                output[j] = max(-self.power, net_load[j],
-                                - (1/self.eff) * (self.capacity - soc))
-                self.soc[j] = soc - self.eff * output[j]
-            elif net_load[j] == 0:  # do nothing
-                self.soc[j] = soc
-        self.output = output
-        return output
-
 
-class PracticalBatteryAsset3(Dispatchable):
+class PracticalBatteryAsset3(BatteryAsset):
     """
     1st life EV battery asset class
 
@@ -611,39 +986,6 @@ class PracticalBatteryAsset3(Dispatchable):
         self.soc = np.ones(T) * self.capacity
         self.install_cost = install_cost * 100  # p/kWh
 
-    def getOutput(self, net_load):
-        """
-        Battery control of charging/discharging in response to net load.
-
-        Parameters
-        ----------
-        net_load : numpy array
-            The net load, (load - nondispatchable gen).
-
-        Returns
-        -------
-        Battery energy use profile : numpy array
-        """
-        T = len(net_load)
-        output = np.zeros((T, 1))
-        for j in range(len(net_load)):
-            if j == 0:
-                soc = self.capacity
-            else:
-                soc = self.soc[j-1]
-
-            if net_load[j] > 0:  # use battery
-                output[j] = min(self.power, net_load[j], self.eff*soc)
-                self.soc[j] = soc - (1/self.eff)*output[j]
-            elif net_load[j] < 0:  # charge battery
-                output[j] = max(-self.power, net_load[j],
-                                - (1/self.eff) * (self.capacity - soc))
-                self.soc[j] = soc - self.eff * output[j]
-            elif net_load[j] == 0:  # do nothing
-                self.soc[j] = soc
-        self.output = output
-        return output
-
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
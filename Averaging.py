@@ -3,75 +3,193 @@
 
 """
 Basic averaging file.
-The output of each asset y, in halfhours over the whole year,
-is split into 5 consecutive blocks. These are entered into numpy
-arrays x in which the rows represent consecutive days in that
-block and the columns represent all the halfhours in that day.
-The average day in that block is then found and returned as a list of numpy arrays.
+The output of each asset y, in halfhours over the whole year, is
+reshaped into a (days, halfhours) array and the days are grouped, by
+default into 5 consecutive blocks (quintiles) but also by calendar
+month, season, weekday/weekend or custom date ranges. The mean, min,
+max and percentile day in each group are found in one vectorised pass,
+for a single series or a (k, T) stack of series at once.
 Author: Mathew Hedges
 """
 
-__version__ = '0.1'
+__version__ = '0.2'
 
 # import modules
-import numpy as np
-
-
-def Averaging(asset_list):
-    # import the relevant list of 1 year's worth of halfhours (17520)
-    y0 = asset_list 
-
-
-    # split the list into 5 1/5ths of a year's worth of halfhours (3504)
-    y1 = y0[0:3504]
-    y2 = y0[3504:7008]
-    y3 = y0[7008:10512]
-    y4 = y0[10512:14016]
-    y5 = y0[14016:17519]
+import warnings
 
-
-    # prepare numpy arrays to fill with each of the days in 1/5th of a year (73)
-    x1 = np.zeros((73,48))
-    x2 = np.zeros((73,48))
-    x3 = np.zeros((73,48))
-    x4 = np.zeros((73,48))
-    x5 = np.zeros((72,48)) # skipping the last day in the last 1/5th because it only has 47 halfhours which is messing up the averaging!
-
-
-    # find the means of the 48 halfhours over the 73 days in each 1/5th of the year
-    for i in range(73): 
-        x1[i] = y1[i*48:(i+1)*48] # put each day's half hours into the rows of x
-    
-    mean1 = np.mean(x1, axis=0)   # find the mean of the halfhours over every day
+import numpy as np
 
 
-    for i in range(73):
-        x2[i] = y2[i*48:(i+1)*48] # put each day's half hours into the rows of x
-  
-    mean2 = np.mean(x2, axis=0)   # find the mean of the halfhours over every day
+SEASONS = ['Winter', 'Spring', 'Summer', 'Autumn']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def groupDays(ndays, groups='quintiles', start='2020-01-01'):
+    """
+    Membership of each day in each group
+
+    Parameters
+    ----------
+    ndays : int
+        Number of days.
+    groups : str, array_like or list of (start, end) dates
+        'quintiles', 'months', 'seasons', 'daytype' (weekday/weekend),
+        'year', a label per day, or inclusive date ranges.
+    start : str
+        Date of the first day.
+
+    Returns
+    -------
+    members : numpy array
+        (n_groups, ndays) boolean membership matrix.
+    names : list
+        Name of each group.
+    """
+    days = np.datetime64(start, 'D') + np.arange(ndays)
+
+    if isinstance(groups, str):
+        if groups == 'quintiles':
+            labels = np.arange(ndays) * 5 // ndays
+            names = ['1st', '2nd', '3rd', '4th', '5th']
+        elif groups == 'months':
+            labels = days.astype('datetime64[M]').astype(int) % 12
+            names = MONTHS
+        elif groups == 'seasons':
+            labels = (days.astype('datetime64[M]').astype(int) % 12 + 1) // 3 % 4
+            names = SEASONS
+        elif groups == 'daytype':
+            labels = ((days.astype(int) + 3) % 7 >= 5).astype(int)  # Monday = 0
+            names = ['Weekday', 'Weekend']
+        elif groups == 'year':
+            labels = np.zeros(ndays, dtype=int)
+            names = ['Year']
+        else:
+            raise ValueError("unknown grouping '%s'" % groups)
+        members = labels == np.arange(len(names))[:, None]
+
+    elif len(groups) and isinstance(groups[0], tuple):
+        members = np.array([(days >= np.datetime64(a, 'D'))
+                            & (days <= np.datetime64(b, 'D'))
+                            for a, b in groups])
+        names = ['%s - %s' % (a, b) for a, b in groups]
+
+    else:
+        labels = np.asarray(groups)
+        names = list(np.unique(labels))
+        members = labels == np.array(names)[:, None]
+
+    return members, names
+
+
+def _reduce(func, days, members, *args):
+    """Apply a nan-aware reduction over the days of each group"""
+    out = np.full((days.shape[0], len(members), days.shape[2]), np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for g, m in enumerate(members):
+            if m.any():
+                out[:, g] = func(days[:, m], *args, axis=1)
+    return out
+
+
+def dailyProfiles(data, groups='quintiles', dt=0.5, start='2020-01-01',
+                  stats=('mean',), percentiles=()):
+    """
+    Average daily profiles of one or many series by day grouping
+
+    Parameters
+    ----------
+    data : array_like
+        (T,) or (T, 1) series, or a (k, T) stack of series.
+    groups : str, array_like or list of (start, end) dates
+        Day grouping, see groupDays.
+    dt : float
+        Time interval (hours)
+    start : str
+        Date of the first interval.
+    stats : tuple of str
+        Any of 'mean', 'min', 'max'.
+    percentiles : tuple of float
+        Percentiles (0-100) to return as 'p<q>'.
+
+    Returns
+    -------
+    profiles : dict
+        Statistic name to (n_groups, steps per day) array, or
+        (k, n_groups, steps per day) for a stack of series.
+    names : list
+        Name of each group.
+    """
+    data = np.asarray(data, dtype=float)
+    single = data.ndim == 1 or (data.ndim == 2 and data.shape[1] == 1)
+    data = data.reshape(1, -1) if single else data
+
+    # pad a partial final day with NaN so no interval is dropped
+    k, T = data.shape
+    spd = int(round(24 / dt))
+    ndays = -(-T // spd)
+    days = np.full((k, ndays * spd), np.nan)
+    days[:, :T] = data
+    days = days.reshape(k, ndays, spd)
+
+    members, names = groupDays(ndays, groups, start)
+    valid = ~np.isnan(days)
+    profiles = {}
+
+    if 'mean' in stats:
+        weights = members.astype(float)
+        totals = np.einsum('gd,kds->kgs', weights, np.where(valid, days, 0))
+        counts = np.einsum('gd,kds->kgs', weights, valid.astype(float))  # per series, NaNs may differ
+        with np.errstate(invalid='ignore', divide='ignore'):
+            profiles['mean'] = totals / counts
+
+    reducers = {'min': np.nanmin, 'max': np.nanmax}
+    for stat in stats:
+        if stat in reducers:
+            profiles[stat] = _reduce(reducers[stat], days, members)
+    for q in percentiles:
+        profiles['p%g' % q] = _reduce(np.nanpercentile, days, members, q)
+
+    if single:
+        profiles = {stat: profile[0] for stat, profile in profiles.items()}
+    return profiles, names
 
 
-    for i in range(73):
-        x3[i] = y3[i*48:(i+1)*48] # put each day's half hours into the rows of x
-    
-    mean3 = np.mean(x3, axis=0)   # find the mean of the halfhours over every day
+def Averaging(asset_list):
+    """
+    Mean day in each fifth of the year
 
+    Parameters
+    ----------
+    asset_list : array_like
+        The relevant list of 1 year's worth of halfhours (17520).
 
-    for i in range(73):
-        x4[i] = y4[i*48:(i+1)*48] # put each day's half hours into the rows of x
-    
-    mean4 = np.mean(x4, axis=0)   # find the mean of the halfhours over every day
+    Returns
+    -------
+    List of 5 mean daily profiles
+    """
+    profiles, names = dailyProfiles(asset_list, groups='quintiles')
+    return list(profiles['mean'])
 
 
-    for i in range(72):
-        x5[i] = y5[i*48:(i+1)*48] # put each day's half hours into the rows of x
-    
-    mean5 = np.mean(x5, axis=0)   # find the mean of the halfhours over every day
+def batchAveraging(series):
+    """
+    Averaging of many series in one vectorised pass
 
+    Parameters
+    ----------
+    series : list of array_like
+        Series of 1 year's worth of halfhours (17520) each.
 
-    # return a list of 5 means
-    return [mean1, mean2, mean3, mean4, mean5] 
+    Returns
+    -------
+    List with the 5 mean daily profiles of each series
+    """
+    profiles, names = dailyProfiles(np.stack([np.asarray(y, dtype=float).reshape(-1)
+                                              for y in series]), groups='quintiles')
+    return [list(means) for means in profiles['mean']]
 
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
@@ -0,0 +1,604 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+3YP optimal dispatch module.
+Schedules the dispatchable (battery) assets against a known net load as
+a sparse linear programme, minimising grid cost, emissions or a weighted
+mix of the two, instead of the greedy rule in Assets.batteryDispatch.
+Solved with SciPy's HiGHS interface.
+Authors: Mathew Hedges
+"""
+
+__version__ = '0.1'
+
+# import modules
+import numpy as np
+
+# throughput cost on battery charge and discharge, per kWh relative to
+# the largest import weight, enough to rule out charging and discharging
+# in the same interval without moving the schedule
+THROUGHPUT = 1e-6
+
+
+class DispatchLP:
+    """
+    Sparse LP of B batteries over T intervals
+
+    Variables are laid out by type, each block B*T (battery major) or T
+    long: charge c, discharge d, state of charge s, grid import and grid
+    export. Per battery b and interval t
+
+        s[b,t] = s[b,t-1] + eff*c[b,t] - d[b,t]/eff     (s[b,-1] = soc0)
+        imp[t] - exp[t] = net_load[t] - sum_b (d[b,t] - c[b,t])
+
+    with 0 <= c, d <= power, 0 <= s <= capacity and imp, exp >= 0. The
+    grid is settled on the net flow, so where exports would be worth
+    more than imports both are priced at the import rate, keeping the LP
+    convex and bounded.
+
+    Nothing in the LP stops a battery charging and discharging in the
+    same interval, which burns (1/eff - eff) of the energy cycled. That
+    only pays where the grid weights are negative (e.g. negative
+    prices), so the battery side of the objective floors them at zero,
+    valuing energy there as free rather than paid for, and a small
+    throughput cost on c + d settles the ties. The battery outputs are
+    rebuilt from the SoC change as in Assets.batteryDispatch, so they
+    always agree with the SoC, and the grid flows follow from them.
+
+    The constraint matrix only depends on the batteries and T, so it is
+    built once and reused for every solve with new loads, prices or
+    initial states.
+
+    Parameters
+    ----------
+    capacity : array_like
+        (B,) battery capacities, kWh.
+    power : array_like
+        (B,) maximum energy per interval, kWh.
+    eff : array_like
+        (B,) charging/discharging efficiencies between 0-1.
+    T : int
+        Number of intervals.
+    """
+
+    def __init__(self, capacity, power, eff, T):
+        from scipy import sparse
+        self.capacity = np.atleast_1d(np.asarray(capacity, dtype=float))
+        self.power = np.atleast_1d(np.asarray(power, dtype=float))
+        self.eff = np.atleast_1d(np.asarray(eff, dtype=float))
+        self.B = B = len(self.capacity)
+        self.T = T
+        BT = B * T
+        self.n = 3 * BT + 2 * T                                 # number of variables
+        c, d, s = np.arange(BT), BT + np.arange(BT), 2*BT + np.arange(BT)
+        imp, exp = 3*BT + np.arange(T), 3*BT + T + np.arange(T)
+
+        # state of charge rows, one per battery and interval
+        eff_bt = np.repeat(self.eff, T)
+        prev = s.reshape(B, T)[:, :-1].reshape(-1)             # s[b,t-1] for t > 0
+        rows = [np.arange(BT), np.arange(BT), np.arange(BT),
+                np.arange(BT).reshape(B, T)[:, 1:].reshape(-1)]
+        cols = [s, c, d, prev]
+        vals = [np.ones(BT), -eff_bt, 1/eff_bt, -np.ones(len(prev))]
+
+        # energy balance rows, one per interval
+        t = np.tile(np.arange(T), B)
+        rows += [BT + t, BT + t, BT + np.arange(T), BT + np.arange(T)]
+        cols += [d, c, imp, exp]
+        vals += [np.ones(BT), -np.ones(BT), np.ones(T), -np.ones(T)]
+
+        self.A_eq = sparse.csc_matrix(
+                (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                shape=(BT + T, self.n))
+
+        self.lower = np.zeros(self.n)
+        self.upper = np.full(self.n, np.inf)
+        self.upper[c] = np.repeat(self.power, T)
+        self.upper[d] = np.repeat(self.power, T)
+        self.upper[s] = np.repeat(self.capacity, T)
+        self.blocks = {'c': c, 'd': d, 's': s, 'imp': imp, 'exp': exp}
+
+    def getObjective(self, import_price, export_price=0, intensity=None,
+                     export_intensity=None, cost_weight=1, emissions_weight=0):
+        """
+        Linear objective of the grid imports and exports
+
+        Parameters
+        ----------
+        import_price : array_like
+            Price of imports, (T,) or scalar (p/kWh).
+        export_price : array_like
+            Price paid for exports, (T,) or scalar (p/kWh).
+        intensity : array_like
+            Carbon intensity of imports, (T,) or scalar (gCO2/kWh).
+        export_intensity : array_like
+            Carbon intensity credited to exports, defaults to intensity.
+        cost_weight : float
+            Weight of the grid cost (per p).
+        emissions_weight : float
+            Weight of the emissions (per gCO2), e.g. a carbon price in
+            p/gCO2 for a weighted mix with cost_weight=1.
+
+        Returns
+        -------
+        objective : numpy array (n,)
+        """
+        return self.weightObjective(*gridWeights(
+                self.T, import_price, export_price, intensity,
+                export_intensity, cost_weight, emissions_weight))
+
+    def weightObjective(self, imp_weight, exp_weight):
+        """
+        Objective from (T,) per kWh weights of imports and exports,
+        floored at zero with a throughput cost on the batteries (see
+        above), so the solver's objective value is not the grid cost.
+        """
+        imp_weight = np.maximum(imp_weight, 0)
+        exp_weight = np.maximum(exp_weight, 0)
+        objective = np.zeros(self.n)
+        objective[self.blocks['imp']] = imp_weight
+        objective[self.blocks['exp']] = -exp_weight
+        scale = max(np.max(imp_weight, initial=0), 1e-12)
+        objective[self.blocks['c']] = THROUGHPUT * scale
+        objective[self.blocks['d']] = THROUGHPUT * scale
+        return objective
+
+    def getProblem(self, net_load, soc0=None, soc_end=None):
+        """
+        Right hand side and variable bounds for one net load
+
+        Parameters
+        ----------
+        net_load : array_like
+            (T,) or (T, 1) net load before the batteries (kWh).
+        soc0 : array_like
+            (B,) state of charge before the first interval, default full.
+        soc_end : array_like
+            (B,) minimum state of charge after the last interval, None
+            for no terminal condition.
+
+        Returns
+        -------
+        b_eq, lower, upper : numpy arrays
+        """
+        B, T = self.B, self.T
+        net = np.asarray(net_load, dtype=float).reshape(-1)
+        if len(net) != T:
+            raise ValueError('net load has %d intervals, LP %d' % (len(net), T))
+        if not np.isfinite(net).all():
+            raise ValueError('net load must be finite for optimal dispatch')
+        soc0 = self.capacity if soc0 is None else _battery(soc0, B)
+
+        b_eq = np.zeros(B*T + T)
+        b_eq[np.arange(B) * T] = soc0                           # s[b,0] - ... = soc0
+        b_eq[B*T:] = net
+
+        lower = self.lower
+        if soc_end is not None:
+            lower = lower.copy()
+            last = self.blocks['s'].reshape(B, T)[:, -1]
+            lower[last] = np.minimum(_battery(soc_end, B), self.capacity)
+        upper = self.upper.copy()                               # grid flows within reach of the net load
+        upper[self.blocks['imp']] = np.maximum(net, 0) + self.power.sum()
+        upper[self.blocks['exp']] = np.maximum(-net, 0) + self.power.sum()
+        return b_eq, lower, upper
+
+    def solve(self, net_load, objective, soc0=None, soc_end=None):
+        """
+        Optimal schedule for one net load
+
+        Parameters
+        ----------
+        net_load : array_like
+            (T,) or (T, 1) net load before the batteries (kWh).
+        objective : numpy array
+            (n,) objective from getObjective.
+        soc0, soc_end : array_like
+            Initial and minimum final states of charge, see getProblem.
+
+        Returns
+        -------
+        dict of 'output' (B, T) battery energy use (discharge positive),
+        'soc' (B, T), 'imports' (T,), 'exports' (T,) and 'objective'.
+        """
+        from scipy.optimize import linprog
+        b_eq, lower, upper = self.getProblem(net_load, soc0, soc_end)
+        res = linprog(objective, A_eq=self.A_eq, b_eq=b_eq,
+                      bounds=np.column_stack([lower, upper]),
+                      method='highs')
+        if res.status != 0:
+            raise RuntimeError('optimal dispatch failed: %s' % res.message)
+        return self.unpack(res.x, net_load, soc0, res.fun)
+
+    def unpack(self, x, net_load, soc0=None, objective=None):
+        """
+        Battery outputs, SoCs and grid flows of a solution vector, the
+        outputs rebuilt from the SoC change and the grid flows from the
+        net load less the outputs.
+        """
+        B, T = self.B, self.T
+        soc0 = self.capacity if soc0 is None else _battery(soc0, B)
+        soc = np.clip(x[self.blocks['s']].reshape(B, T), 0,
+                      self.capacity[:, None])
+        change = np.diff(soc, axis=1, prepend=soc0[:, None])
+        eff = self.eff[:, None]
+        output = np.where(change > 0, -change / eff, -change * eff)
+        grid = np.asarray(net_load, dtype=float).reshape(-1) - output.sum(axis=0)
+        return {'output': output,
+                'soc': soc,
+                'imports': np.maximum(grid, 0),
+                'exports': np.maximum(-grid, 0),
+                'objective': objective}
+
+
+class HighsDispatch:
+    """
+    Persistent HiGHS model of a DispatchLP
+
+    The model is passed to HiGHS once; each solve only changes the
+    costs, bounds and right hand side, so HiGHS re-solves from the
+    previous optimal basis (a warm start) rather than from scratch.
+    Needs the highspy package, see getSolver for the fallback.
+
+    Parameters
+    ----------
+    lp : DispatchLP
+        Problem structure.
+    """
+
+    def __init__(self, lp):
+        import highspy
+        self.lp = lp
+        self.highs = highspy.Highs()
+        self.highs.setOptionValue('output_flag', False)
+        self.optimal = highspy.HighsModelStatus.kOptimal
+
+        A = lp.A_eq
+        model = highspy.HighsLp()
+        model.num_col_ = lp.n
+        model.num_row_ = A.shape[0]
+        model.col_cost_ = np.zeros(lp.n)
+        model.col_lower_ = lp.lower
+        model.col_upper_ = np.minimum(lp.upper, highspy.kHighsInf)
+        model.row_lower_ = np.zeros(A.shape[0])
+        model.row_upper_ = np.zeros(A.shape[0])
+        model.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        model.a_matrix_.start_ = A.indptr
+        model.a_matrix_.index_ = A.indices
+        model.a_matrix_.value_ = A.data
+        self.highs.passModel(model)
+        self.cols = np.arange(lp.n, dtype=np.int32)
+        self.rows = np.arange(A.shape[0], dtype=np.int32)
+
+    def solve(self, net_load, objective, soc0=None, soc_end=None):
+        """Optimal schedule for one net load, see DispatchLP.solve"""
+        highs = self.highs
+        b_eq, lower, upper = self.lp.getProblem(net_load, soc0, soc_end)
+        highs.changeColsCost(len(self.cols), self.cols, objective)
+        highs.changeColsBounds(len(self.cols), self.cols, lower, upper)
+        highs.changeRowsBounds(len(self.rows), self.rows, b_eq, b_eq)
+        highs.run()
+        if highs.getModelStatus() != self.optimal:
+            raise RuntimeError('optimal dispatch failed: %s' % highs.modelStatusToString(
+                    highs.getModelStatus()))
+        x = np.array(highs.getSolution().col_value)
+        return self.lp.unpack(x, net_load, soc0,
+                              highs.getInfo().objective_function_value)
+
+
+def getSolver(lp, warm_start=True):
+    """
+    Solver for repeated solves of one DispatchLP: a warm started
+    HighsDispatch if highspy is installed, else the LP itself (SciPy's
+    linprog, which solves each time from scratch).
+    """
+    if warm_start:
+        try:
+            return HighsDispatch(lp)
+        except ImportError:
+            pass
+    return lp
+
+
+def _series(value, T):
+    """Broadcast a scalar, (T,) or (T, 1) input to a (T,) float array"""
+    value = np.asarray(value, dtype=float).reshape(-1)
+    if len(value) == 1:
+        return np.full(T, value[0])
+    if len(value) < T:
+        raise ValueError('series has %d intervals, need %d' % (len(value), T))
+    return value[:T]
+
+
+def _battery(value, B):
+    """Broadcast a scalar or (B,) per battery input to a (B,) float array"""
+    return np.broadcast_to(np.asarray(value, dtype=float).reshape(-1), (B,))
+
+
+def gridWeights(T, import_price, export_price=0, intensity=None,
+                export_intensity=None, cost_weight=1, emissions_weight=0):
+    """
+    Objective weights of grid imports and exports, see
+    DispatchLP.getObjective for the parameters.
+
+    Returns
+    -------
+    imp_weight, exp_weight : numpy arrays (T,)
+        Weight per kWh imported and per kWh exported.
+    """
+    imp_weight = np.zeros(T)
+    exp_weight = np.zeros(T)
+    if cost_weight:
+        imp_weight += cost_weight * _series(import_price, T)
+        exp_weight += cost_weight * _series(export_price, T)
+    if emissions_weight:
+        if intensity is None:
+            raise ValueError('emissions weighted dispatch needs an intensity')
+        if export_intensity is None:
+            export_intensity = intensity
+        imp_weight += emissions_weight * _series(intensity, T)
+        exp_weight += emissions_weight * _series(export_intensity, T)
+    return imp_weight, np.minimum(exp_weight, imp_weight)
+
+
+def optimalDispatch(net_load, batteries, import_price, export_price=0,
+                    intensity=None, export_intensity=None, cost_weight=1,
+                    emissions_weight=0, terminal=True):
+    """
+    Optimal charge/discharge of battery assets against a net load
+
+    Parameters
+    ----------
+    net_load : array_like
+        (T,) or (T, 1) net load, (load - nondispatchable gen).
+    batteries : list
+        Battery assets (capacity, power and eff attributes).
+    import_price, export_price : array_like
+        Grid prices, (T,) or scalar (p/kWh).
+    intensity, export_intensity : array_like
+        Carbon intensities of imports/exports (gCO2/kWh), only needed if
+        emissions_weight is set.
+    cost_weight, emissions_weight : float
+        Objective weights per p and per gCO2.
+    terminal : bool
+        Require each battery to end at least as charged as it starts
+        (full), so stored energy is not sold off for free at year end.
+
+    Returns
+    -------
+    dict of 'output' (B, T), 'soc' (B, T), 'imports', 'exports' (see
+    DispatchLP.solve) and 'objective', the weighted grid cost.
+    """
+    T = len(np.asarray(net_load).reshape(-1))
+    lp = DispatchLP([b.capacity for b in batteries],
+                    [b.power for b in batteries],
+                    [b.eff for b in batteries], T)
+    imp_weight, exp_weight = gridWeights(T, import_price, export_price,
+                                         intensity, export_intensity,
+                                         cost_weight, emissions_weight)
+    schedule = lp.solve(net_load, lp.weightObjective(imp_weight, exp_weight),
+                        soc_end=lp.capacity if terminal else None)
+    schedule['objective'] = (schedule['imports'] @ imp_weight
+                             - schedule['exports'] @ exp_weight)
+    return schedule
+
+
+def rollingDispatch(net_load, batteries, import_price, export_price=0,
+                    intensity=None, export_intensity=None, cost_weight=1,
+                    emissions_weight=0, horizon=48, step=1, terminal=True,
+                    warm_start=True):
+    """
+    Rolling horizon (model predictive) battery dispatch
+
+    At each step the optimal schedule over the next horizon intervals is
+    solved from the current states of charge, the first step intervals
+    are committed and the window moves on. Only the lookahead is known to
+    each solve, unlike the perfect foresight of optimalDispatch. The LP
+    structure is built once per window length. Solves are only warm
+    started if the optional highspy package is installed; otherwise
+    each window is solved from scratch by SciPy's linprog, about three
+    times slower. Each window's committed outputs are rebuilt from its
+    SoCs (see DispatchLP) and the last committed SoC starts the next.
+
+    Parameters
+    ----------
+    net_load, batteries, import_price, export_price, intensity,
+    export_intensity, cost_weight, emissions_weight :
+        As optimalDispatch.
+    horizon : int
+        Lookahead of each solve, intervals (48 is a day of half hours).
+    step : int
+        Intervals committed per solve.
+    terminal : bool
+        Require each battery to end the period as charged as it starts,
+        applied once the lookahead reaches the last interval.
+    warm_start : bool
+        Warm start each solve from the last with a persistent HiGHS
+        model, which needs highspy; ignored if it is not installed.
+
+    Returns
+    -------
+    dict of 'output' (B, T), 'soc' (B, T), 'imports', 'exports' and
+    'objective' of the committed schedule.
+    """
+    net = np.asarray(net_load, dtype=float).reshape(-1)
+    T = len(net)
+    if horizon < step:
+        raise ValueError('horizon must be at least one step')
+    capacity = np.array([b.capacity for b in batteries], dtype=float)
+    power = np.array([b.power for b in batteries], dtype=float)
+    eff = np.array([b.eff for b in batteries], dtype=float)
+    imp_weight, exp_weight = gridWeights(T, import_price, export_price,
+                                         intensity, export_intensity,
+                                         cost_weight, emissions_weight)
+
+    solvers = {}                                                # by window length, only the tail differs
+    output = np.zeros((len(batteries), T))
+    soc = np.zeros((len(batteries), T))
+    soc0 = capacity
+    for t in range(0, T, step):
+        H = min(horizon, T - t)
+        if H not in solvers:
+            solvers[H] = getSolver(DispatchLP(capacity, power, eff, H),
+                                   warm_start)
+        solver = solvers[H]
+        lp = getattr(solver, 'lp', solver)
+        objective = lp.weightObjective(imp_weight[t:t + H], exp_weight[t:t + H])
+        soc_end = None
+        if terminal and t + H == T:                             # as full as the lookahead can reach
+            soc_end = np.minimum(capacity, soc0 + eff * power * H)
+        window = solver.solve(net[t:t + H], objective, soc0, soc_end)
+
+        k = min(step, H)
+        output[:, t:t + k] = window['output'][:, :k]
+        soc[:, t:t + k] = window['soc'][:, :k]
+        soc0 = np.clip(soc[:, t + k - 1], 0, capacity)
+
+    grid = net - output.sum(axis=0)
+    imports = np.maximum(grid, 0)
+    exports = np.maximum(-grid, 0)
+    return {'output': output,
+            'soc': soc,
+            'imports': imports,
+            'exports': exports,
+            'objective': imports @ imp_weight - exports @ exp_weight}
+
+
+def _dpBattery(net, imp_weight, exp_weight, capacity, power, eff, levels,
+               terminal=True, chunk=1024):
+    """
+    Backward induction for one battery on an SoC grid of S levels
+
+    The grid is uniform, so the cost of a move from level i to level j
+    only depends on j - i: each interval has 2S - 1 stage costs, gathered
+    into an (S, S) transition table for the minimisation.
+
+    Parameters
+    ----------
+    net : numpy array
+        (T,) net load before the battery (kWh).
+    imp_weight, exp_weight : numpy arrays
+        (T,) objective weights, see gridWeights.
+    capacity, power, eff : float
+        Battery parameters as in Assets.BatteryAsset.
+    levels : int
+        Number of SoC grid levels S, from empty to full.
+    terminal : bool
+        End full, as the battery starts.
+    chunk : int
+        Intervals whose stage costs are built together.
+
+    Returns
+    -------
+    output : numpy array (T,)
+        Battery energy use (discharge positive).
+    soc : numpy array (T,)
+    """
+    T = len(net)
+    grid_soc = np.linspace(0, capacity, levels)
+    step = grid_soc[1] if levels > 1 else 0
+    moves = np.arange(1 - levels, levels)                       # j - i, charging positive
+    change = moves * step
+    output = np.where(change > 0, -change / eff, -change * eff)
+    feasible = np.abs(output) <= power * (1 + 1e-9)
+    if levels > 1 and not feasible[levels]:
+        raise ValueError('SoC step of %.4g kWh exceeds the battery power, '
+                         'use more levels' % step)
+    penalty = np.where(feasible, 0, np.inf)                    # bars moves beyond the power limit
+    premium = imp_weight - exp_weight                           # on imports over the export weight
+    offsets = np.subtract.outer(np.arange(levels), np.arange(levels))
+    offsets = levels - 1 - offsets                              # (S, S) index of j - i in moves
+
+    value = np.zeros(levels)                                    # cost to go after the last interval
+    if terminal:
+        value[:-1] = np.inf
+    policy = np.empty((T, levels), dtype=np.int32)
+    rows = np.arange(levels)
+    for end in range(T, 0, -chunk):
+        start = max(end - chunk, 0)
+        grid = net[start:end, None] - output[None]              # (K, 2S - 1) grid flow
+        stage = exp_weight[start:end, None] * grid
+        stage += premium[start:end, None] * np.maximum(grid, 0)
+        stage += penalty
+        for k in range(end - start - 1, -1, -1):
+            total = stage[k][offsets]
+            total += value
+            best = total.argmin(axis=1)
+            policy[start + k] = best
+            value = total[rows, best]
+
+    if not np.isfinite(value[-1]):
+        raise ValueError('no feasible dispatch ends the battery full')
+    state = np.empty(T, dtype=np.int64)
+    i = levels - 1                                              # starts full
+    for t in range(T):
+        i = policy[t, i]
+        state[t] = i
+    soc = grid_soc[state]
+    previous = np.concatenate([[capacity], soc[:-1]])
+    change = soc - previous
+    return np.where(change > 0, -change / eff, -change * eff), soc
+
+
+def dpDispatch(net_load, batteries, import_price, export_price=0,
+               intensity=None, export_intensity=None, cost_weight=1,
+               emissions_weight=0, levels=101, resolution=None, terminal=True):
+    """
+    Dynamic programming battery dispatch, a solver free alternative to
+    optimalDispatch
+
+    Each battery's SoC is discretised into levels and the cost to go is
+    computed by backward induction, all levels at once with an (S, S)
+    transition per interval, so run time is linear in T and quadratic in
+    the number of levels. The batteries are dispatched one after the
+    other in list order, each against the net load left by the previous
+    ones, as in basic_energy_balance; a joint grid would grow as S**B.
+    Moves are limited to whole grid steps, so coarser grids trade
+    accuracy for speed.
+
+    Parameters
+    ----------
+    net_load, batteries, import_price, export_price, intensity,
+    export_intensity, cost_weight, emissions_weight, terminal :
+        As optimalDispatch.
+    levels : int
+        Number of SoC grid levels per battery.
+    resolution : float
+        SoC grid step (kWh), overriding levels.
+
+    Returns
+    -------
+    dict of 'output' (B, T), 'soc' (B, T), 'imports', 'exports' and
+    'objective', see DispatchLP.solve.
+    """
+    net = np.asarray(net_load, dtype=float).reshape(-1)
+    if not np.isfinite(net).all():
+        raise ValueError('net load must be finite for optimal dispatch')
+    T = len(net)
+    imp_weight, exp_weight = gridWeights(T, import_price, export_price,
+                                         intensity, export_intensity,
+                                         cost_weight, emissions_weight)
+    output = np.zeros((len(batteries), T))
+    soc = np.zeros((len(batteries), T))
+    remaining = net.copy()
+    for b, battery in enumerate(batteries):
+        n_levels = levels
+        if resolution is not None:
+            n_levels = int(np.ceil(battery.capacity / resolution)) + 1
+        output[b], soc[b] = _dpBattery(remaining, imp_weight, exp_weight,
+                                       battery.capacity, battery.power,
+                                       battery.eff, n_levels, terminal)
+        remaining -= output[b]
+
+    imports = np.maximum(remaining, 0)
+    exports = np.maximum(-remaining, 0)
+    return {'output': output,
+            'soc': soc,
+            'imports': imports,
+            'exports': exports,
+            'objective': imports @ imp_weight - exports @ exp_weight}
+
+
+if __name__ == "__main__":
+    pass
@@ -8,15 +8,172 @@ the year 2020 is imported as a CSV file into a
 pandas dataframe and then converted to a numpy 
 array for outputting. Losses between generation 
 and consumption are included using a loss factor.
+The monthly actual/forecast files can instead be assembled into one
+series, cached in binary form, and projected onto a target year.
 Author: Mathew Hedges
 """
 
-__version__ = '0.1'
+__version__ = '0.2'
 
 # import modules
-import pandas as pd
+import os
+
 import numpy as np
 
+import Profiles as PF
+
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+_intensity = {}  # assembled monthly series, keyed by folder and file times
+
+
+def monthlyFilepaths(data_dir='data'):
+    """Return the monthly carbon intensity files in calendar order"""
+    return [os.path.join(data_dir, 'Carbon_Intensity_Data_%s.csv' % month)
+            for month in MONTHS]
+
+
+def loadIntensity(data_dir='data'):
+    """
+    Timestamped carbon intensity assembled from the monthly files
+
+    The monthly files are parsed once and the assembled series is saved
+    as a binary twin (npy/carbon_intensity.npy and .index.npy) that is
+    memory-mapped on later runs, until any monthly file changes.
+
+    Parameters
+    ----------
+    data_dir : str
+        Folder holding the Carbon_Intensity_Data_<Month>.csv files.
+
+    Returns
+    -------
+    index : numpy array
+        datetime64[ns] start of each half hour of the year (UTC).
+    values : numpy array
+        (T, 3) actual, forecast and combined intensity (gCO2/kWh), NaN
+        where a period is missing. The combined series is the actual
+        with gaps filled by the forecast, then by the previous day, then
+        by linear interpolation.
+    """
+    filepaths = monthlyFilepaths(data_dir)
+    newest = max(os.stat(f).st_mtime_ns for f in filepaths)
+    key = (os.path.abspath(data_dir), newest)
+    if key in _intensity:
+        return _intensity[key]
+
+    twin = os.path.join(data_dir, 'carbon_intensity.csv')  # binaries only
+    values_path = PF.binaryPath(twin)
+    index_path = PF.binaryPath(twin, 'index')
+    try:
+        fresh = min(os.stat(values_path).st_mtime_ns,
+                    os.stat(index_path).st_mtime_ns) >= newest
+    except FileNotFoundError:
+        fresh = False
+
+    if fresh:
+        index = np.asarray(np.load(index_path, mmap_mode='r'))
+        values = np.asarray(np.load(values_path, mmap_mode='r'))
+    else:
+        import pandas as pd
+        df = pd.concat([pd.read_csv(f, usecols=[0, 1, 2]) for f in filepaths])
+        times = pd.to_datetime(df.iloc[:, 0], utc=True).dt.tz_localize(None)
+        times = times.values.astype('datetime64[ns]')
+
+        # regular half hourly grid over the calendar year, first of any
+        # duplicated timestamps kept, missing periods left as NaN
+        year = times[0].astype('datetime64[Y]')
+        index = np.arange(year.astype('datetime64[ns]'),
+                          (year + 1).astype('datetime64[ns]'),
+                          np.timedelta64(30, 'm'))
+        times, first = np.unique(times, return_index=True)
+        pos = (times - index[0]) // np.timedelta64(30, 'm')
+        values = np.full((len(index), 3), np.nan)
+        values[pos, 0] = df.iloc[first, 1].values.astype(float)  # actual
+        values[pos, 1] = df.iloc[first, 2].values.astype(float)  # forecast
+
+        # combined: actual, else forecast, else the same period the day
+        # before (e.g. a missing 29th February), else interpolated
+        combined = np.where(np.isnan(values[:, 0]), values[:, 1], values[:, 0])
+        gaps = np.isnan(combined)
+        while gaps[48:].any() and not gaps[48:].all():
+            fill = np.flatnonzero(gaps[48:] & ~gaps[:-48]) + 48
+            if not len(fill):
+                break
+            combined[fill] = combined[fill - 48]
+            gaps = np.isnan(combined)
+        if gaps.any():
+            combined[gaps] = np.interp(np.flatnonzero(gaps),
+                                       np.flatnonzero(~gaps), combined[~gaps])
+        values[:, 2] = combined
+        os.makedirs(os.path.dirname(values_path), exist_ok=True)
+        np.save(values_path, values)
+        np.save(index_path, index)
+
+    index.flags.writeable = False
+    values.flags.writeable = False
+    _intensity[key] = (index, values)
+    return index, values
+
+
+def projectIntensity(index, intensity, year, target_mean=None,
+                     annual_change=0):
+    """
+    Project an intensity series onto a target year
+
+    The series keeps its half hourly shape and is moved to the same
+    month, day and time in the target year (dropping or repeating 29th
+    February as needed), then scaled either to a target annual mean or
+    by a compound annual change.
+
+    Parameters
+    ----------
+    index : numpy array
+        datetime64 start of each interval, within one calendar year.
+    intensity : numpy array
+        Intensity of each interval (gCO2/kWh).
+    year : int
+        Target year.
+    target_mean : float
+        Annual mean intensity in the target year (gCO2/kWh).
+    annual_change : float
+        Fractional change per year, e.g. -0.05, used if no target_mean.
+
+    Returns
+    -------
+    index, intensity : numpy array
+        Projected timestamps and intensity.
+    """
+    index = np.asarray(index, dtype='datetime64[ns]')
+    intensity = np.asarray(intensity, dtype=float)
+    days = index.astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    base = int(months[0].astype('datetime64[Y]').astype(int)) + 1970
+
+    # same month, day of month and time of day in the target year
+    month_of_year = months.astype(int) % 12
+    target = (np.datetime64('%04d-01' % year, 'M') + month_of_year).astype('datetime64[D]')
+    target = target + (days - months.astype('datetime64[D]'))
+    new_index = target.astype('datetime64[ns]') + (index - days.astype('datetime64[ns]'))
+
+    keep = target.astype('datetime64[M]') == (np.datetime64('%04d-01' % year, 'M') + month_of_year)
+    new_index, intensity = new_index[keep], intensity[keep]  # 29th Feb into a common year
+    feb28 = np.datetime64('%04d-02-28' % year, 'D')
+    if (np.datetime64('%04d-03-01' % year, 'D') - feb28).astype(int) == 2:
+        leap = new_index.astype('datetime64[D]') == feb28
+        if leap.any() and not (new_index.astype('datetime64[D]') == feb28 + 1).any():
+            at = np.flatnonzero(leap)[-1] + 1
+            new_index = np.insert(new_index, at, new_index[leap] + np.timedelta64(1, 'D'))
+            intensity = np.insert(intensity, at, intensity[leap])
+
+    if target_mean is not None:
+        factor = target_mean / np.nanmean(intensity)
+    else:
+        factor = (1 + annual_change) ** (year - base)
+    return new_index, intensity * factor
+
 
 class Emissions:
     """
@@ -29,20 +186,39 @@ class Emissions:
         
     profile_filepath : str
         Filepath to load profile
+
+    year : int
+        If given, use the monthly actual/forecast series projected to
+        this year instead of profile_filepath.
+
+    target_mean : float
+        Annual mean intensity of the projected year (gCO2/kWh).
+
+    annual_change : float
+        Fractional change per year applied when projecting, if no
+        target_mean.
     """
-    def __init__(self, loss, profile_filepath='data/Carbon_Intensity_Data_2020.csv', **kwargs):    
+    def __init__(self, loss, profile_filepath='data/Carbon_Intensity_Data_2020.csv',
+                 year=None, target_mean=None, annual_change=0, **kwargs):    
         super().__init__()
         loss_factor = 1 / (1 - loss)
         self.loss_factor = loss_factor
         self.profile_filepath = profile_filepath
+        self.year = year
+        self.target_mean = target_mean
+        self.annual_change = annual_change
+        self.index = None
         self.profile = self.co2Profile()
         
     def co2Profile(self):
-        df = pd.read_csv(self.profile_filepath, usecols=[0]) # gCO2 / kWh
-        #print('carbon intensity of electricity generation (data) coming...')
-        #print(df.info())
-        #print(df.head(50))
-        return df
+        if self.year is None:
+            profile = PF.getProfile(self.profile_filepath, usecols=[0]) # gCO2 / kWh
+            return profile
+        index, values = loadIntensity(os.path.dirname(self.profile_filepath))
+        self.index, profile = projectIntensity(index, values[:, 2], self.year,
+                                               self.target_mean,
+                                               self.annual_change)
+        return profile.reshape(-1, 1) # gCO2 / kWh
         
     def getEmissionIntensity(self):
         """
@@ -57,13 +233,71 @@ class Emissions:
         -------
         Carbon intensity of consumption : numpy array
         """
-        gen_intensity = self.profile.values # gCO2 / kWh
+        gen_intensity = self.profile # gCO2 / kWh
         con_intensity = gen_intensity * self.loss_factor # gCO2 / kWh 
         self.con_intensity = con_intensity
         #print('carbon intensity of electricity consumption (output) coming...')
         #print(con_intensity)
         return con_intensity
 
+    def getEmissions(self, net_load, export_factor=1, export_intensity=None,
+                     profile=False, dt=0.5):
+        """
+        Import emissions, export credit and net emissions of net loads
+
+        Parameters
+        ----------
+        net_load : array_like
+            (T,) or (T, 1) net load, or (N, T) net loads (kWh), imports
+            positive.
+        export_factor : float
+            Share of the consumption intensity credited to exports; 1
+            treats exports as negative imports, 0 gives no credit.
+        export_intensity : float or array_like
+            Carbon intensity displaced by exports (gCO2/kWh), overriding
+            export_factor, e.g. a marginal generation intensity. Series
+            longer than the net load are cropped to it.
+        profile : bool
+            Also return the net emissions of each interval.
+        dt : float
+            Time interval of the net load (hours), the half hourly
+            intensity is averaged onto it.
+
+        Returns
+        -------
+        dict of 'import', 'export' (credit, negative) and 'net'
+        emissions (tnCO2), floats for one net load or (N,) arrays for
+        many, plus 'profile' of (T,) or (N, T) if requested.
+        """
+        net_load = np.asarray(net_load, dtype=float)
+        if net_load.ndim == 2 and net_load.shape[1] == 1:
+            net_load = net_load[:, 0]
+        T = net_load.shape[-1]
+
+        con_intensity = self.getEmissionIntensity().reshape(-1)
+        if dt != 0.5:
+            con_intensity = PF.TimeAxis(dt, T).resample(con_intensity, 'mean', step=0.5)
+        if len(con_intensity) < T:
+            raise ValueError('carbon intensity has %d intervals, net load %d'
+                             % (len(con_intensity), T))
+        import_intensity = con_intensity[:T] / 1000000  # tnCO2/kWh
+        if export_intensity is None:
+            export_intensity = import_intensity * export_factor
+        else:
+            export_intensity = np.broadcast_to(
+                    np.asarray(export_intensity, dtype=float).reshape(-1)[:T]
+                    / 1000000, (T,))
+
+        imports = np.maximum(net_load, 0)
+        exports = np.minimum(net_load, 0)
+        emissions = {'import': imports @ import_intensity,
+                     'export': exports @ export_intensity}
+        emissions['net'] = emissions['import'] + emissions['export']
+        if profile:
+            emissions['profile'] = (imports * import_intensity
+                                    + exports * export_intensity)
+        return emissions
+
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
@@ -12,6 +12,11 @@ __version__ = '0.5'
 # import modules
 import numpy as np
 
+import Profiles as PF
+
+
+GENERATION = ('PV', 'SF', 'HYDRO')  # non-dispatchable assets that generate
+
 
 class EnergySystem:
     """
@@ -41,73 +46,528 @@ class EnergySystem:
         self.assets = nondispat + dispat
         self.dt = dt  
         self.T = T    
+        self.superposition = None
+        self.superposition_key = None
+        self.version = 0                                        # bumped whenever a new balance is computed
+        self.nondis_key = None
+        self.disp_key = None
+        self.result = None
+
+    @property
+    def time(self):
+        """TimeAxis of the system, every asset profile is aligned to it"""
+        return PF.TimeAxis(self.dt, self.T)
+
+    def invalidate(self):
+        """Force the next energy balance to be fully recomputed."""
+        self.nondis_key = None
+        self.disp_key = None
+
+    def getSuperposition(self):
+        """
+        Return the superposition engine of the non-dispatchable assets,
+        building the stacked unit profiles on first use and rebuilding
+        them when an asset's unit output parameters (anything but its
+        count) or the time axis change.
+        """
+        key = (self.dt, self.T) + tuple((id(asset), asset.getUnitKey())
+                                        for asset in self.nondispat)
+        if self.superposition is None or self.superposition_key != key:
+            self.superposition = Superposition(self.nondispat, self.time)
+            self.superposition_key = key
+        return self.superposition
 
     def basic_energy_balance(self):
         """
         Basic energy system balancing. Dispatchable assets are deployed in
         order defined by list.
 
+        Each asset's parameters are keyed (see getKey in Assets). If only
+        dispatchable assets changed since the last call the cached
+        non-dispatchable load is reused and only dispatch is re-run; if
+        nothing changed the previous result is returned as is.
+
         Returns
         -------
 
-        net_load : Array
-            The net load of the system.
+        result : SimulationResult
+            Columnar result holding every asset output, the net load, the
+            dispatchable and the non-dispatchable load. Unpacks as
+            net_load, disp_load, non_disp_load (each (T, 1)).
         """
         nondispat = self.nondispat                              # nondispatchable asset list
         dispat = self.dispat                                    # dispatchable asset list
 
+        # parameter keys decide which stages need re-running
+        nondis_key = self._nondis_key()
+        disp_key = tuple((id(asset), asset.getKey()) for asset in dispat)
+
+        if nondis_key == self.nondis_key and disp_key == self.disp_key:
+            return self.result
+
+        n = len(nondispat)
+        result, net_nondis = self._nondispatchable(nondis_key)
+        net_load = result.data[-3]
+        net_load[:] = net_nondis
+
+
+        # deploy dispatchable gen
+        for i, asset in enumerate(dispat):
+            profile = asset.getOutput(net_load)                 # surplus load is dispatched to the batteries
+            result.data[n + i] = profile.reshape(-1)
+            net_load -= result.data[n + i]
+
+
+        return self._store(result, net_nondis, nondis_key, disp_key)
+
+    def optimal_energy_balance(self, import_price, export_price=0,
+                               intensity=None, export_intensity=None,
+                               cost_weight=1, emissions_weight=0,
+                               terminal=True, horizon=None, step=1,
+                               method='lp', levels=101):
+        """
+        Energy balance with the dispatchable assets scheduled together
+        by a linear programme (see Dispatch.optimalDispatch), optionally
+        re-solved over a rolling horizon, or by dynamic programming,
+        rather than greedily. Each asset's output and soc are set as in
+        basic_energy_balance.
+
+        Parameters
+        ----------
+        import_price : array_like
+            Import price, e.g. marketObject.mip (p/kWh).
+        export_price : array_like
+            Export price (p/kWh).
+        intensity : array_like
+            Carbon intensity of imports, e.g. Emissions.getEmissionIntensity
+            (gCO2/kWh).
+        export_intensity : array_like
+            Carbon intensity credited to exports, defaults to intensity.
+        cost_weight : float
+            Objective weight per p of grid cost.
+        emissions_weight : float
+            Objective weight per gCO2 emitted.
+        terminal : bool
+            Require the batteries to end the period as charged as they
+            started.
+        horizon : int
+            If given, dispatch with a rolling horizon of this many
+            intervals (Dispatch.rollingDispatch) instead of perfect
+            foresight of the whole period.
+        step : int
+            Intervals committed per rolling horizon solve.
+        method : str
+            'lp' for the linear programme, or 'dp' for dynamic programming
+            over a grid of levels per battery (Dispatch.dpDispatch),
+            which needs no solver.
+        levels : int
+            Number of SoC grid levels per battery for 'dp'.
+
+        Returns
+        -------
+        result : SimulationResult
+        """
+        import Dispatch as DP
+        dispat = self.dispat
+        nondis_key = self._nondis_key()
+        result, net_nondis = self._nondispatchable(nondis_key)
+        net_load = result.data[-3]
+        net_load[:] = net_nondis
+
+        n = len(self.nondispat)
+        if dispat:
+            if method not in ('lp', 'dp'):
+                raise ValueError("method must be 'lp' or 'dp', not %r" % method)
+            if method == 'dp':
+                if horizon is not None:
+                    raise ValueError('rolling horizon dispatch needs the lp method')
+                schedule = DP.dpDispatch(net_nondis, dispat, import_price,
+                                         export_price, intensity,
+                                         export_intensity, cost_weight,
+                                         emissions_weight, levels,
+                                         terminal=terminal)
+            elif horizon is None:
+                schedule = DP.optimalDispatch(net_nondis, dispat, import_price,
+                                              export_price, intensity,
+                                              export_intensity, cost_weight,
+                                              emissions_weight, terminal)
+            else:
+                schedule = DP.rollingDispatch(net_nondis, dispat, import_price,
+                                              export_price, intensity,
+                                              export_intensity, cost_weight,
+                                              emissions_weight, horizon, step,
+                                              terminal)
+            for i, asset in enumerate(dispat):
+                result.data[n + i] = schedule['output'][i]
+                asset.output = schedule['output'][i].reshape(-1, 1)
+                asset.soc[:self.T] = schedule['soc'][i]
+                net_load -= result.data[n + i]
+
+        # never matches a parameter key, so a later basic balance re-dispatches
+        disp_key = ('optimal',)
+        return self._store(result, net_nondis, nondis_key, disp_key)
+
+    def iter_energy_balance(self, chunk=None, T=None, sources=None):
+        """
+        Streamed basic energy balance, one chunk of intervals at a time
+
+        Non-dispatchable outputs are generated chunk by chunk (see
+        iterOutput in Assets) and batteries carry only their terminal
+        state of charge from one chunk to the next, so memory does not
+        grow with the length of the run. The dispatch is the same as
+        basic_energy_balance; asset outputs and socs are not stored.
+
+        Parameters
+        ----------
+        chunk : int
+            Intervals per chunk, a week by default.
+        T : int
+            Intervals in the run, self.T by default. Year long profiles
+            repeat for longer, multi-year runs.
+        sources : dict
+            Optional {asset: iterable of (n,) output chunks} replacing a
+            non-dispatchable asset's own output, e.g. a generator over a
+            memory-mapped measured series (see Profiles.iterChunks).
+            Chunks must match the chunk lengths of the run.
+
+        Yields
+        ------
+        start : int
+            First interval of the chunk.
+        result : SimulationResult
+            Energy balance of the chunk.
+        """
+        import Assets as AS
+        time = PF.getTimeAxis(self.dt)
+        chunk = 7 * time.stepsPerDay if chunk is None else int(chunk)
+        T = self.T if T is None else int(T)
+        sources = sources or {}
+        nondispat = self.nondispat
+        dispat = self.dispat
+        n = len(nondispat)
+
+        outputs = [iter(sources[asset]) if asset in sources
+                   else asset.iterOutput(time, chunk, T) for asset in nondispat]
+        signs = [-1.0 if asset.asset_type in GENERATION else 1.0 for asset in nondispat]
+        soc = [asset.capacity for asset in dispat]              # batteries start full
+        jit = AS.useJit(T * len(dispat))                        # one kernel choice for the whole run
+
+        for start in range(0, T, chunk):
+            result = SimulationResult(nondispat, dispat, self.dt,
+                                      min(chunk, T - start))
+            net_nondis = result.data[-1]
+            for i, output in enumerate(outputs):
+                result.data[i] = next(output)
+                net_nondis += signs[i] * result.data[i]
+
+            net_load = result.data[-3]
+            net_load[:] = net_nondis
+            for i, asset in enumerate(dispat):
+                output, chunk_soc = asset.getChunkOutput(net_load, soc[i], jit)
+                result.data[n + i] = output.reshape(-1)
+                net_load -= result.data[n + i]
+                soc[i] = chunk_soc[-1]                          # terminal soc carried to the next chunk
+            result.data[-2] = result.data[-3] - net_nondis
+            yield start, result
+
+    def stream_energy_balance(self, sinks, chunk=None, T=None, sources=None):
+        """
+        Run a streamed energy balance into incremental sinks
+
+        Parameters
+        ----------
+        sinks : list
+            Objects with an add(start, result) method, e.g. the
+            aggregators and writers in Streaming. They are not closed.
+        chunk, T, sources :
+            As for iter_energy_balance.
+
+        Returns
+        -------
+        sinks : list
+        """
+        for start, result in self.iter_energy_balance(chunk, T, sources):
+            for sink in sinks:
+                sink.add(start, result)
+        return sinks
+
+    def _nondis_key(self):
+        return (self.dt, self.T) + tuple((id(asset), asset.getKey())
+                                         for asset in self.nondispat)
+
+    def _nondispatchable(self, nondis_key):
+        """
+        New result with the non-dispatchable outputs filled in, copied from
+        the previous result if their parameters have not changed.
+
+        Returns
+        -------
+        result : SimulationResult
+        net_nondis : numpy array
+            (T,) net non-dispatchable load, a row of result.data.
+        """
+        nondispat = self.nondispat
+        result = SimulationResult(nondispat, self.dispat, self.dt, self.T)
+        net_nondis = result.data[-1]
+        n = len(nondispat)
 
         # sum non-dispatchable assets
-        net_nondis = np.zeros((self.T, 1))
-        for i, asset in enumerate(nondispat):
-            if asset.asset_type == 'DOMESTIC_LOAD':
-                profile = nondispat[i].getOutput(self.dt)
-            
-            elif asset.asset_type == 'HEAT_PUMP_LOAD': 
-                profile = nondispat[i].getOutput()
+        if nondis_key == self.nondis_key:
+            result.data[:n] = self.result.data[:n]              # only dispatchable assets changed
+            net_nondis[:] = self.result.data[-1]
+        else:
+            net_nondis[:] = 0
+            time = self.time
+            for i, asset in enumerate(nondispat):
+                result.data[i] = asset.getOutput(time).reshape(-1)
+
+                if asset.asset_type in GENERATION:
+                    net_nondis -= result.data[i]                # -1 x generation asset
+                else:
+                    net_nondis += result.data[i]
+
+        self.non_disp_load = result.non_disp_load               # returns net non-dispatchable load
+        return result, net_nondis
+
+    def _store(self, result, net_nondis, nondis_key, disp_key):
+        """Finish a balance: dispatchable load, cached result and keys"""
+        result.data[-2] = result.data[-3] - net_nondis
+        self.net_load = result.net_load
+        self.disp_load = result.disp_load                       # returns net dispatachable load
+        self.result = result
+        self.nondis_key = nondis_key
+        self.disp_key = disp_key
+        self.version += 1
+
+        return result
+
+
+class SimulationResult:
+    """
+    Columnar energy balance result
 
-            elif asset.asset_type == 'EV_LOAD': 
-                profile = nondispat[i].getOutput(self.dt)
-              
-            elif asset.asset_type == 'NON_DOMESTIC_LOAD': 
-                profile = nondispat[i].getOutput(self.dt)
-               
-            elif asset.asset_type == 'PV':
-                profile = -1 * nondispat[i].getOutput(self.dt)  # -1 x generation asset
+    All series live in one contiguous (n_series, T) array: one row per
+    asset output (generation positive), then the net load, the
+    dispatchable load and the non-dispatchable load. Rows are returned as
+    read-only (T,) views and derived series are computed lazily once.
 
-            elif asset.asset_type == 'SF':
-                profile = -1 * nondispat[i].getOutput(self.dt)  # -1 x generation asset
-               
-            elif asset.asset_type == 'HYDRO':
-                profile = -1 * nondispat[i].getOutput(self.dt)  # -1 x generation asset
-             
+    Parameters
+    ----------
+    nondispat : list
+        List of non-dispatchable asset objects
 
-            net_nondis = net_nondis + profile
+    dispat : list
+        List of dispatchable asset objects
 
+    dt : float
+        time step
 
-        self.non_disp_load = net_nondis                         # returns net non-dispatchable load
-        net_load = net_nondis
+    T : int
+        Number of time intervals
+    """
 
+    def __init__(self, nondispat, dispat, dt, T):
+        self.nondispat = list(nondispat)
+        self.dispat = list(dispat)
+        self.assets = self.nondispat + self.dispat
+        self.dt = dt
+        self.T = T
+        self.columns = []
+        for asset in self.assets:
+            name = asset.asset_type
+            count = sum(1 for c in self.columns if c.split('#')[0] == name)
+            self.columns.append(name if count == 0 else '%s#%d' % (name, count + 1))
+        self.columns += ['net_load', 'disp_load', 'non_disp_load']
+        self.data = np.zeros((len(self.columns), T))
+        self._rows = {name: i for i, name in enumerate(self.columns)}
+        self._rows.update({id(asset): i for i, asset in enumerate(self.assets)})
+        self._cache = {}
+
+    def __getitem__(self, key):
+        """Row view by column name or asset object"""
+        if not isinstance(key, str):
+            key = id(key)
+        row = self.data[self._rows[key]].view()
+        row.flags.writeable = False
+        return row
+
+    def __iter__(self):
+        # unpacks as net_load, disp_load, non_disp_load for older scripts
+        return iter((self.net_load, self.disp_load, self.non_disp_load))
+
+    def _column(self, name):
+        return self[name].reshape(-1, 1)
+
+    @property
+    def net_load(self):
+        return self._column('net_load')
+
+    @property
+    def disp_load(self):
+        return self._column('disp_load')
+
+    @property
+    def non_disp_load(self):
+        return self._column('non_disp_load')
+
+    def _derived(self, name, func):
+        if name not in self._cache:
+            series = func()
+            series.flags.writeable = False
+            self._cache[name] = series
+        return self._cache[name]
+
+    def getSum(self, assets, signed=False):
+        """
+        Sum of some asset rows
 
-        # deploy dispatchable gen
-        for i, asset in enumerate(dispat):
-            profile = asset.getOutput(net_load)                 # surplus load is dispatched to the batteries
-            net_load = net_load - profile
+        Parameters
+        ----------
+        assets : list
+            Asset objects or column names.
+        signed : bool
+            Subtract generation assets, giving their net load.
 
+        Returns
+        -------
+        (T,) numpy array
+        """
+        rows = [self._rows[a if isinstance(a, str) else id(a)] for a in assets]
+        weights = np.ones(len(rows))
+        if signed:
+            weights = np.array([-1.0 if self.columns[r].split('#')[0] in GENERATION
+                                else 1.0 for r in rows])
+        return weights @ self.data[rows]
+
+    @property
+    def gross_load(self):
+        """Sum of all non-dispatchable loads"""
+        return self._derived('gross_load', lambda: self.getSum(
+                [a for a in self.nondispat if a.asset_type not in GENERATION]))
+
+    @property
+    def gross_gen(self):
+        """Sum of all non-dispatchable generation"""
+        return self._derived('gross_gen', lambda: self.getSum(
+                [a for a in self.nondispat if a.asset_type in GENERATION]))
+
+    @property
+    def grid_imports(self):
+        """Energy imported from the grid in each interval"""
+        return self._derived('grid_imports',
+                             lambda: np.maximum(self['net_load'], 0))
+
+    @property
+    def grid_exports(self):
+        """Energy exported to the grid in each interval (positive)"""
+        return self._derived('grid_exports',
+                             lambda: np.maximum(-self['net_load'], 0))
+
+    def getKpis(self, series='net_load'):
+        """
+        Annual key performance indicators of a net load series
 
-        self.net_load = net_load
-        self.disp_load = net_load - net_nondis                  # returns net dispatachable load
+        Parameters
+        ----------
+        series : str or numpy array
+            Column name or (T,) net load, e.g. a no-system baseline.
 
+        Returns
+        -------
+        dict of KPIs, energies in kWh
+        """
+        key = 'kpis_' + series if isinstance(series, str) else None
+        if key is not None and key in self._cache:
+            return self._cache[key]
+        net = self[series] if isinstance(series, str) else np.asarray(series).reshape(-1)
+        kpis = {'net_load': net.sum(),
+                'imports': net[net > 0].sum(),
+                'exports': -net[net < 0].sum(),
+                'peak_import': net.max(),
+                'import_fraction': np.count_nonzero(net > 0) / len(net)}
+        if key is not None:
+            self._cache[key] = kpis
+        return kpis
+
+
+class Superposition:
+    """
+    Linear superposition engine for non-dispatchable assets
 
-        disp_load = self.disp_load
-        non_disp_load = self.non_disp_load
+    Every non-dispatchable output is a fixed unit profile times a count,
+    so the net non-dispatchable load is a matrix-vector product of the
+    signed counts with the stacked (n_assets, T) unit profiles.
 
+    Parameters
+    ----------
+    nondispat : list
+        List of non-dispatchable asset objects
+
+    dt : float or TimeAxis
+        time step, or the time axis the unit profiles are aligned to
+    """
+
+    def __init__(self, nondispat, dt):
+        self.assets = list(nondispat)
+        self.dt = PF.getTimeAxis(dt).dt
+        self.profiles = np.vstack([asset.getUnitOutput(dt).reshape(-1)
+                                   for asset in self.assets])
+        self.profiles.flags.writeable = False
+        self.signs = np.array([-1.0 if asset.asset_type in GENERATION
+                               else 1.0 for asset in self.assets])
+
+    def getCounts(self, changes=None):
+        """
+        Return the current asset counts as a vector
 
-        return net_load, disp_load, non_disp_load
+        Parameters
+        ----------
+        changes : dict
+            Optional {asset: count} overrides.
+
+        Returns
+        -------
+        counts : numpy array (n_assets,)
+        """
+        changes = changes or {}
+        return np.array([changes.get(asset, asset.getUnits())
+                         for asset in self.assets], dtype=float)
+
+    def getNetLoad(self, counts=None):
+        """
+        Net non-dispatchable load for one or many count vectors
+
+        Parameters
+        ----------
+        counts : array_like
+            (n_assets,) counts, or (K, n_assets) for a sweep of K points.
+            Defaults to the current asset counts.
+
+        Returns
+        -------
+        net_nondis : numpy array
+            (T, 1) for a single count vector, (K, T) for a sweep.
+        """
+        if counts is None:
+            counts = self.getCounts()
+        weights = np.asarray(counts, dtype=float) * self.signs
+        net_nondis = weights @ self.profiles
+        if net_nondis.ndim == 1:
+            return net_nondis.reshape(-1, 1)
+        return net_nondis
 
 
 def E_to_dailyE(data, dt):
-    daily_sum = data.reshape(int(len(data)/(24/dt)), int(24/dt)).sum(axis=1)
+    """
+    Daily totals of a per interval series, a trailing part day is summed
+    into a final entry of its own.
+    """
+    data = np.asarray(data).reshape(-1)
+    spd = int(round(24 / dt))
+    whole = len(data) // spd * spd
+    daily_sum = data[:whole].reshape(-1, spd).sum(axis=1)
+    if whole < len(data):
+        daily_sum = np.append(daily_sum, data[whole:].sum())
 
     return daily_sum
 
@@ -5,12 +5,395 @@
 Authors: Avinash Vijay, Scot Wheeler
 """
 
-__version__ = "0.4"
+__version__ = "0.5"
 
-import pandas as pd
 import numpy as np
 import datetime
 
+import Profiles as PF
+
+
+class PriceStore:
+    """
+    Imbalance prices as aligned numpy columns on a settlement period index.
+
+    The series is loaded once (through the profile store) and window
+    queries are answered by offset arithmetic from the first settlement
+    period, rather than by label slicing a date indexed DataFrame.
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath of the settlement period price data, one row per period.
+    step : int
+        Settlement period length (minutes).
+    """
+    COLUMNS = {'ssp': 2, 'sbp': 3, 'niv': 4}  # SSP, SBP (£/MWh), NIV (MWh)
+
+    def __init__(self, filepath='data/sspsbpniv.csv', step=30):
+        self.filepath = filepath
+        self.step = np.timedelta64(step, 'm')
+        self.columns = {}
+        self.start = None
+
+    def _load(self):
+        if self.start is None:
+            values = PF.getProfile(self.filepath,
+                                   usecols=sorted(self.COLUMNS.values()))
+            first = min(self.COLUMNS.values())
+            self.columns = {name: values[:, col - first]
+                            for name, col in self.COLUMNS.items()}
+            self.start = PF.getIndex(self.filepath)[0]
+        return self.columns
+
+    def __len__(self):
+        return len(self._load()['sbp'])
+
+    def offsets(self, startDate, endDate):
+        """
+        Settlement period offsets of an inclusive date window
+
+        Returns
+        -------
+        i0, i1 : int
+            First and one past the last period within the window.
+        """
+        self._load()
+        n = len(self)
+        lo = (np.datetime64(startDate, 'ns') - self.start) / self.step
+        hi = (np.datetime64(endDate, 'ns') - self.start) / self.step
+        i0 = min(max(int(np.ceil(lo)), 0), n)
+        i1 = min(max(int(np.floor(hi)) + 1, i0), n)
+        return i0, i1
+
+    def getIndex(self, startDate, endDate):
+        """Return the datetime64 index of a window"""
+        i0, i1 = self.offsets(startDate, endDate)
+        return self.start + self.step * np.arange(i0, i1)
+
+    def getWindow(self, startDate, endDate, column='sbp'):
+        """
+        Prices over an inclusive date window
+
+        Parameters
+        ----------
+        startDate : datetime
+            Start of period of interest.
+        endDate : datetime
+            End of period of interest.
+        column : str
+            'ssp', 'sbp' or 'niv'.
+
+        Returns
+        -------
+        Read-only numpy array view of the window.
+        """
+        i0, i1 = self.offsets(startDate, endDate)
+        return self._load()[column][i0:i1]
+
+    def getAligned(self, index, column='sbp'):
+        """
+        Prices of the settlement periods containing each timestamp
+
+        Parameters
+        ----------
+        index : numpy array
+            datetime64 timestamps, e.g. from timeIndex.
+        column : str
+            'ssp', 'sbp' or 'niv'.
+
+        Returns
+        -------
+        numpy array, NaN outside the stored period.
+        """
+        series = self._load()[column]
+        offset = (np.asarray(index, 'datetime64[ns]') - self.start) // self.step
+        inside = (offset >= 0) & (offset < len(series))
+        values = np.full(len(offset), np.nan)
+        values[inside] = series[offset[inside]]
+        return values
+
+    def clear(self):
+        """Forget the loaded columns, e.g. after the data file changes"""
+        self.columns = {}
+        self.start = None
+
+
+prices = PriceStore()
+
+
+def timeIndex(startDate, T, dt):
+    """
+    Start time of each interval of a simulation
+
+    Parameters
+    ----------
+    startDate : datetime
+        Start of the first interval.
+    T : int
+        Number of intervals.
+    dt : float
+        Time interval (hours)
+
+    Returns
+    -------
+    datetime64[ns] numpy array
+    """
+    step = np.timedelta64(int(round(dt * 3600e9)), 'ns')
+    return np.datetime64(startDate, 'ns') + step * np.arange(T)
+
+
+class WholesaleRate:
+    """
+    Half-hourly wholesale import price from the imbalance price store.
+
+    Parameters
+    ----------
+    column : str
+        Price column of the store, 'sbp' or 'ssp'.
+    bill_fact : float
+        Proportion of the bill related to energy; the price is scaled
+        up by 1/bill_fact, as in marketObject.
+    prices : PriceStore
+        Source of the prices.
+    """
+    def __init__(self, column='sbp', bill_fact=1, prices=prices):
+        self.column = column
+        self.bill_fact = bill_fact
+        self.prices = prices
+
+    def getPrices(self, index):
+        rate = self.prices.getAligned(index, self.column) / 10  # £/MWh to p/kWh
+        return rate / self.bill_fact, 0
+
+
+class FlatRate:
+    """
+    Flat import and export unit rates.
+
+    Parameters
+    ----------
+    import_rate : float
+        Import unit rate (p/kWh).
+    export_rate : float
+        Export unit rate (p/kWh).
+    """
+    def __init__(self, import_rate=0, export_rate=0):
+        self.import_rate = import_rate
+        self.export_rate = export_rate
+
+    def getPrices(self, index):
+        return self.import_rate, self.export_rate
+
+
+class AgileExportRate:
+    """
+    Octopus Agile Outgoing style half-hourly export rate.
+
+    The published rates cover 2018 to mid 2019, so the simulation index
+    is shifted to start at dataStart; intervals beyond the data hold the
+    last rate.
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath of the timestamped export rates (p/kWh).
+    dataStart : datetime
+        Date of the data that the first simulation interval maps to,
+        None to use the simulation dates as they are.
+    """
+    def __init__(self, filepath='data/octopus_outgoing_2018_SE.csv',
+                 dataStart=datetime.datetime(2018, 1, 1)):
+        self.filepath = filepath
+        self.dataStart = dataStart
+
+    def getPrices(self, index):
+        times = PF.getIndex(self.filepath)
+        rates = PF.getProfile(self.filepath, usecols=[1])[:, 0]
+        order = np.argsort(times, kind='stable')  # clock change rows
+        times, rates = times[order], rates[order]
+        if self.dataStart is not None:
+            index = index - index[0] + np.datetime64(self.dataStart, 'ns')
+        pos = np.searchsorted(times, index, side='right') - 1
+        return 0, rates[np.clip(pos, 0, len(rates) - 1)]
+
+
+class NetworkBands:
+    """
+    Red/amber/green time of day network (DUoS) import charges.
+
+    Parameters
+    ----------
+    red, amber, green : float
+        Unit charge in each band (p/kWh). The defaults are indicative
+        domestic values, not a published charging statement.
+    red_hours, amber_hours : list of (start, end)
+        Band periods in hours of the day, end exclusive. Hours outside
+        both are green.
+    weekdays_only : bool
+        Weekends are green throughout.
+    """
+    def __init__(self, red=3.5, amber=0.5, green=0.1,
+                 red_hours=((16.5, 19),), amber_hours=((9, 16.5), (19, 20.5)),
+                 weekdays_only=True):
+        self.red = red
+        self.amber = amber
+        self.green = green
+        self.red_hours = red_hours
+        self.amber_hours = amber_hours
+        self.weekdays_only = weekdays_only
+
+    def getPrices(self, index):
+        days = index.astype('datetime64[D]')
+        hour = (index - days) / np.timedelta64(1, 'h')
+        weekday = (days.astype(int) + 3) % 7 < 5  # Monday = 0
+        rate = np.full(len(index), float(self.green))
+        for hours, charge in ((self.amber_hours, self.amber),
+                              (self.red_hours, self.red)):
+            band = np.zeros(len(index), dtype=bool)
+            for start, end in hours:
+                band |= (hour >= start) & (hour < end)
+            if self.weekdays_only:
+                band &= weekday
+            rate[band] = charge
+        return rate, 0
+
+
+class StandingCharge:
+    """
+    Fixed daily charge.
+
+    Parameters
+    ----------
+    charge : float
+        Standing charge (p/day).
+    """
+    def __init__(self, charge):
+        self.charge = charge
+
+    def getPrices(self, index):
+        return 0, 0
+
+
+class Tariff:
+    """
+    Import/export tariff composed of rate components.
+
+    Each component returns import and export unit rates for the
+    simulation's intervals; the tariff sums them into a (T,) import and
+    a (T,) export price vector so the year settles with two dot
+    products.
+
+    Parameters
+    ----------
+    components : list
+        Rate components, e.g. WholesaleRate, FlatRate, AgileExportRate,
+        NetworkBands, StandingCharge.
+    startDate : datetime
+        Start of the first interval.
+    name : str
+        Label of the tariff.
+    """
+    def __init__(self, components, startDate=datetime.datetime(2017, 1, 1),
+                 name=''):
+        self.components = list(components)
+        self.startDate = startDate
+        self.name = name
+        self._prices = {}
+
+    def getPrices(self, T, dt):
+        """
+        Import and export price vectors
+
+        Parameters
+        ----------
+        T : int
+            Number of intervals.
+        dt : float
+            Time interval (hours)
+
+        Returns
+        -------
+        import_price, export_price : numpy array
+            (T,) unit rates (p/kWh).
+        """
+        if (T, dt) not in self._prices:
+            index = timeIndex(self.startDate, T, dt)
+            import_price = np.zeros(T)
+            export_price = np.zeros(T)
+            for component in self.components:
+                imp, exp = component.getPrices(index)
+                import_price += imp
+                export_price += exp
+            import_price.flags.writeable = False
+            export_price.flags.writeable = False
+            self._prices[(T, dt)] = (import_price, export_price)
+        return self._prices[(T, dt)]
+
+    def getStandingCharge(self, T, dt):
+        """Total standing charge over T intervals (p)"""
+        days = T * dt / 24
+        return sum(c.charge for c in self.components
+                   if isinstance(c, StandingCharge)) * days
+
+    def settle(self, net_load, dt):
+        """
+        Settle a net load against the tariff
+
+        Parameters
+        ----------
+        net_load : array_like
+            (T,) or (T, 1) net load per interval (kWh), imports positive.
+        dt : float
+            Time interval (hours)
+
+        Returns
+        -------
+        dict of import cost, export payment (negative) and standing
+        charge, and their total (p).
+        """
+        net_load = np.asarray(net_load, dtype=float).reshape(-1)
+        import_price, export_price = self.getPrices(len(net_load), dt)
+        bill = {'import': np.maximum(net_load, 0) @ import_price,
+                'export': np.minimum(net_load, 0) @ export_price,
+                'standing': self.getStandingCharge(len(net_load), dt)}
+        bill['total'] = bill['import'] + bill['export'] + bill['standing']
+        return bill
+
+
+def settleTariffs(tariffs, net_load, dt):
+    """
+    Total cost of many tariffs against one or many net loads
+
+    The (K, 2T) stack of import and export price vectors is multiplied
+    by the (2T,) or (2T, N) stack of import and export energies, so all
+    tariffs settle in a single matrix product.
+
+    Parameters
+    ----------
+    tariffs : list of Tariff
+        The K tariffs.
+    net_load : array_like
+        (T,) or (T, 1) net load, or (N, T) net loads (kWh).
+    dt : float
+        Time interval (hours)
+
+    Returns
+    -------
+    (K,) or (K, N) total cost (p)
+    """
+    net_load = np.asarray(net_load, dtype=float)
+    if net_load.ndim == 2 and net_load.shape[1] == 1:
+        net_load = net_load[:, 0]
+    T = net_load.shape[-1]
+    prices = np.array([np.concatenate(t.getPrices(T, dt)) for t in tariffs])
+    energy = np.concatenate([np.maximum(net_load, 0),
+                             np.minimum(net_load, 0)], axis=-1)
+    standing = np.array([t.getStandingCharge(T, dt) for t in tariffs])
+    if energy.ndim == 1:
+        return prices @ energy + standing
+    return prices @ energy.T + standing[:, None]
+
 
 class marketObject():
     """
@@ -19,13 +402,20 @@ class marketObject():
     def __init__(self, system,
                  startDate=datetime.datetime(2017, 1, 1),
                  endDate=datetime.datetime(2017, 12, 31, 23, 59, 59),
-                 export_rate=5.24):
+                 export_rate=5.24, prices=prices, tariff=None):
         
         self.system = system
         self.bill_fact = 0.33  # percentage of bill related to energy
+        self.prices = prices
+        self.tariff = tariff
+        self.cache = None  # (system version, {name: cost profile})
         
-        self.mip = self.getMipRates(startDate, endDate).values / 10  # convert £/mWh to p/kWh
+        sbp = self.prices.getWindow(startDate, endDate, 'sbp')
+        self.mip = sbp.reshape(-1, 1) / 10  # convert £/mWh to p/kWh
         self.mip /= self.bill_fact
+        time = getattr(system, 'time', None)
+        if time is not None and time.dt != 0.5:
+            self.mip = time.resample(self.mip, 'mean', step=0.5).reshape(-1, 1)  # half hourly prices on the system time axis
         self.export_rate = export_rate
 
     def getMipRates(self, startDate, endDate):
@@ -46,34 +436,63 @@ class marketObject():
             Import market imbalance price (£/MWh).
 
         """
-        data1 = pd.read_csv('data/sspsbpniv.csv', index_col=0,
-                            parse_dates=True)
-        start = data1.index[0]
-        new_index = pd.date_range(start=start, periods=len(data1), freq='0.5H')
-        
-        data1.set_index(new_index, inplace=True)
+        import pandas as pd
         apxData = pd.DataFrame(
-                data1.loc[startDate:endDate, "System Buy Price(£/MWh)"])
+                self.prices.getWindow(startDate, endDate, 'sbp'),
+                index=pd.DatetimeIndex(self.prices.getIndex(startDate, endDate)),
+                columns=["System Buy Price(£/MWh)"])
         return apxData
 
+    def invalidate(self):
+        """
+        Drop the cached cost profiles, e.g. after changing export_rate,
+        mip or the tariff. A new energy balance of the system is picked
+        up automatically.
+        """
+        self.cache = None
+
+    def _cached(self, name, compute):
+        """Return a cost profile, computed once per system result version"""
+        version = getattr(self.system, 'version', None)
+        if self.cache is None or self.cache[0] != version:
+            self.cache = (version, {})
+        profiles = self.cache[1]
+        if name not in profiles:
+            profiles[name] = compute()
+        return profiles[name]
+
     def getGridCost(self):
         """
         Calculate import/export payments for net electricity, including
-        export rate.
+        export rate, or at the tariff's unit rates if one is set.
 
         Returns
         -------
         Total cost
         """
+        cost = self._cached('grid', self._gridCost)
+        self.grid_cost = cost
+        return cost
+
+    def _gridCost(self):
         net_load = self.system.net_load
 
+        if self.tariff is not None:
+            import_price, export_price = self.tariff.getPrices(
+                    len(net_load), self.system.dt)
+            cost_profile = np.where(net_load >= 0, import_price[:, None],
+                                    export_price[:, None])
+            cost = net_load * cost_profile
+            cost.flags.writeable = False
+            return cost
+
         import_E = net_load >= 0
         export_E = net_load < 0
         cost_profile = np.zeros((len(net_load),1))
         cost_profile[import_E] = self.mip[import_E]
         cost_profile[export_E] = self.export_rate
         cost = net_load * cost_profile
-        self.grid_cost = cost
+        cost.flags.writeable = False
         return cost
 
     def getFiTGenCost(self):
@@ -81,11 +500,16 @@ class marketObject():
         Calculate generation FiT contribution
         Fit generation rate set in asset.
         """
+        FitGen_profile = self._cached('fit', self._fitGenCost)
+        self.genFiT = FitGen_profile
+        return FitGen_profile
+
+    def _fitGenCost(self):
         FitGen_profile = np.zeros((len(self.system.net_load),1))
         for asset in self.system.assets:
             asset_FiTGen = asset.output * asset.genFiT
             FitGen_profile += asset_FiTGen
-        self.genFiT = FitGen_profile
+        FitGen_profile.flags.writeable = False
         return FitGen_profile
 
     def getInstallCost(self):
@@ -93,6 +517,9 @@ class marketObject():
         Total install cost of system.
         Install cost and expected lifetime set in asset.
         """
+        return self._cached('install', self._installCost)
+
+    def _installCost(self):
         total_install_cost = 0
         total_per_year_life = 0
         for asset in self.system.assets:
@@ -104,25 +531,60 @@ class marketObject():
 
     def getTotalCost(self):
         """
-        Total system cost. Grid + FiT gen + installation
+        Total system cost. Grid + FiT gen + installation, plus the
+        tariff's standing charge if one is set
         """
         total_cost = (self.getGridCost().sum()
                       - self.getFiTGenCost().sum()
                       + self.getInstallCost()[1])
+        if self.tariff is not None:
+            total_cost += self.tariff.getStandingCharge(
+                    len(self.system.net_load), self.system.dt)
         return total_cost
 
     def gridBreakdown(self):
         """
         Separate import and export payment
         """
+        return self._cached('breakdown', self._gridBreakdown)
+
+    def _gridBreakdown(self):
         net_load = self.system.net_load
         grid_cost = self.getGridCost()
         purchased = np.zeros((len(net_load),1))
         sold = np.zeros((len(net_load),1))
         purchased[grid_cost >= 0] = grid_cost[grid_cost >= 0]
         sold[grid_cost < 0] = grid_cost[grid_cost < 0]
+        purchased.flags.writeable = False
+        sold.flags.writeable = False
         return purchased, sold
 
+    def settle(self):
+        """
+        Annual settlement of the system's current energy balance
+
+        Returns
+        -------
+        dict (p) of
+            import : spend on grid imports
+            export : revenue from grid exports (negative)
+            fit : generation FiT income
+            capex : annualised installation cost
+            standing : tariff standing charge
+            total : as getTotalCost
+        """
+        purchased, sold = self.gridBreakdown()
+        bill = {'import': purchased.sum(),
+                'export': sold.sum(),
+                'fit': self.getFiTGenCost().sum(),
+                'capex': self.getInstallCost()[1],
+                'standing': 0}
+        if self.tariff is not None:
+            bill['standing'] = self.tariff.getStandingCharge(
+                    len(self.system.net_load), self.system.dt)
+        bill['total'] = self.getTotalCost()
+        return bill
+
 
 if __name__ == "__main__":
     price = marketObject(None, datetime.datetime(2017, 1, 1),
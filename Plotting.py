@@ -5,26 +5,248 @@
 Basic plotting file.
 The mean day for each asset class from a 
 given 1/5th of the year is plotted here.
+Figures can also be rendered off-screen in a process pool straight to
+image files with renderFigures, and full year series are drawn at
+screen resolution through min/max or LTTB decimation.
 Author: Mathew Hedges
 """
 
-__version__ = '0.2'
+__version__ = '0.3'
 
 # import modules
-import matplotlib.pyplot as plt
-import pandas as pd
-import matplotlib.dates as mdates
-import datetime
-from pandas import Timestamp    
-    
-    
+import os
+import sys
+import multiprocessing as mp
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def _xAxis(periods, start='2020-01-01'):
+    """Half hourly datetime64 x axis, built once per length and shared"""
+    x_axis = np.datetime64(start, 'm') + np.arange(periods) * np.timedelta64(30, 'm')
+    x_axis.flags.writeable = False
+    return x_axis
+
+def minMaxIndex(y, n_buckets):
+    """
+    Indices of the minimum and maximum of each of n_buckets equal
+    buckets, in time order, so peaks and troughs survive decimation.
+    """
+    y = np.asarray(y, dtype=float).reshape(-1)
+    T = len(y)
+    if T <= 2 * n_buckets:
+        return np.arange(T)
+    size = -(-T // n_buckets)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:T] = y
+    padded = padded.reshape(n_buckets, size)
+    valid = ~np.isnan(padded).all(axis=1)
+    offsets = np.arange(n_buckets)[valid] * size
+    lo = np.nanargmin(padded[valid], axis=1) + offsets
+    hi = np.nanargmax(padded[valid], axis=1) + offsets
+    return np.unique(np.concatenate([[0], lo, hi, [T - 1]]))
+
+
+def lttbIndex(y, n_out, x=None):
+    """
+    Largest-triangle-three-buckets downsampling
+
+    Keeps the first and last points and, from each of n_out - 2 buckets,
+    the point forming the largest triangle with the previously kept
+    point and the mean of the next bucket.
+
+    Parameters
+    ----------
+    y : array_like
+        (T,) values.
+    n_out : int
+        Number of points to keep.
+    x : array_like
+        (T,) numeric x values, defaults to the index.
+
+    Returns
+    -------
+    Indices of the kept points
+    """
+    y = np.asarray(y, dtype=float).reshape(-1)
+    T = len(y)
+    if n_out >= T or n_out < 3:
+        return np.arange(T)
+    x = np.arange(T, dtype=float) if x is None else np.asarray(x, dtype=float)
+    edges = np.linspace(1, T - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, T - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 2 < n_out - 1:
+            nlo, nhi = hi, edges[b + 2]
+        else:
+            nlo, nhi = T - 1, T
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[b + 1] = a
+    return keep
+
+
+def decimate(x, y, max_points=2000, method='minmax'):
+    """
+    Downsample a long series for drawing
+
+    Parameters
+    ----------
+    x, y : array_like
+        (T,) x values and series.
+    max_points : int
+        Points to keep, e.g. twice the axes width in pixels.
+    method : str
+        'minmax' (min/max envelope of each bucket) or 'lttb'.
+
+    Returns
+    -------
+    x, y : numpy arrays of at most max_points (+2) points
+    """
+    x = np.asarray(x)
+    y = np.asarray(y).reshape(-1)
+    if len(y) <= max_points:
+        return x, y
+    if method == 'lttb':
+        numeric = x.astype('datetime64[ns]').astype(float) if x.dtype.kind == 'M' else x
+        idx = lttbIndex(y, max_points, numeric)
+    else:
+        idx = minMaxIndex(y, max_points // 2)
+    return x[idx], y[idx]
+
+
+class Pyramid:
+    """
+    Multi-resolution min/max pyramid of a long series
+
+    Level k holds the index of the minimum and maximum of each bucket of
+    2**k points, built from level k-1 by pairing its buckets, so any
+    x range can be drawn at screen resolution by picking a level and
+    slicing it, without rescanning the data.
+
+    Parameters
+    ----------
+    x : array_like
+        (T,) increasing x values (numbers or datetime64).
+    y : array_like
+        (T,) series.
+    """
+    def __init__(self, x, y):
+        self.x = np.asarray(x)
+        self.y = np.asarray(y, dtype=float).reshape(-1)
+        self.levels = [(np.arange(len(self.y)), np.arange(len(self.y)))]
+        y = self.y
+        while len(self.levels[-1][0]) > 2:
+            lo, hi = self.levels[-1]
+            if len(lo) % 2:
+                lo, hi = np.append(lo, lo[-1]), np.append(hi, hi[-1])
+            a, b = lo[0::2], lo[1::2]
+            lo = np.where((y[b] < y[a]) | np.isnan(y[a]), b, a)
+            a, b = hi[0::2], hi[1::2]
+            hi = np.where((y[b] > y[a]) | np.isnan(y[a]), b, a)
+            self.levels.append((lo, hi))
+
+    def getIndex(self, i0=0, i1=None, max_points=2000):
+        """
+        Indices to draw for the points i0 to i1 (exclusive)
+
+        Returns
+        -------
+        Sorted indices, at most about max_points of them
+        """
+        i1 = len(self.y) if i1 is None else i1
+        i0, i1 = max(i0, 0), min(i1, len(self.y))
+        if i1 <= i0:
+            return np.arange(0)
+        k = 0
+        while 2 * ((i1 - i0) >> k) > max_points and k + 1 < len(self.levels):
+            k += 1
+        if k == 0:
+            return np.arange(i0, i1)
+
+        # whole buckets from level k, partial buckets at either end scanned
+        lo, hi = self.levels[k]
+        b0, b1 = -(-i0 >> k), i1 >> k
+        if b1 <= b0:
+            return minMaxIndex(self.y[i0:i1], max(max_points // 2, 1)) + i0
+        parts = [[i0, i1 - 1], lo[b0:b1], hi[b0:b1]]
+        for s0, s1 in ((i0, b0 << k), (b1 << k, i1)):
+            segment = self.y[s0:s1]
+            if len(segment) and not np.isnan(segment).all():
+                parts.append([s0 + np.nanargmin(segment), s0 + np.nanargmax(segment)])
+        return np.unique(np.concatenate(parts)).astype(int)
+
+    def query(self, xmin=None, xmax=None, max_points=2000):
+        """
+        Points to draw for an x range
+
+        Returns
+        -------
+        x, y : numpy arrays
+        """
+        i0 = 0 if xmin is None else int(np.searchsorted(self.x, xmin, 'left'))
+        i1 = len(self.x) if xmax is None else int(np.searchsorted(self.x, xmax, 'right'))
+        idx = self.getIndex(max(i0 - 1, 0), i1 + 1, max_points)
+        return self.x[idx], self.y[idx]
+
+
+def plotSeries(ax, x, y, *args, method='minmax', max_points=None, **kwargs):
+    """
+    Plot a long series at screen resolution
+
+    Drop-in for ax.plot(x, y, ...). Series longer than max_points
+    (default twice the axes width in pixels) are decimated with min/max
+    envelopes through a Pyramid that is re-queried when the x limits
+    change, so zooming redraws detail quickly; method='lttb' draws a
+    fixed largest-triangle-three-buckets selection instead.
+
+    Returns
+    -------
+    The Line2D drawn
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float).reshape(-1)
+    if max_points is None:
+        max_points = max(2 * int(ax.bbox.width), 200)
+    if len(y) <= max_points:
+        return ax.plot(x, y, *args, **kwargs)[0]
+    if method == 'lttb':
+        return ax.plot(*decimate(x, y, max_points, 'lttb'), *args, **kwargs)[0]
+
+    import matplotlib.dates as mdates
+    numeric = mdates.date2num(x) if x.dtype.kind == 'M' else x
+    pyramid = Pyramid(numeric, y)
+    idx = pyramid.getIndex(0, len(y), max_points)
+    line, = ax.plot(x[idx], y[idx], *args, **kwargs)
+
+    def update(axes):
+        xmin, xmax = axes.get_xlim()
+        i0 = int(np.searchsorted(numeric, xmin, 'left'))
+        i1 = int(np.searchsorted(numeric, xmax, 'right'))
+        idx = pyramid.getIndex(max(i0 - 1, 0), i1 + 1, max_points)
+        line.set_data(x[idx], y[idx])
+
+    ax.callbacks.connect('xlim_changed', update)
+    line.pyramid = pyramid
+    return line
+
+
 def loadPlotting(net_load_mean, non_disp_load_mean, dom_mean, nondom_mean, ev_mean, hp_mean):
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
 
     fig,ax =  plt.subplots(nrows=3,ncols=2,sharex=True,sharey=False)
     plt.xticks(rotation=90)
     fig.tight_layout(pad=3.0)
     
-    x_axis = pd.date_range('2020' + '-01-01', periods = 48, freq= '0.5H') 
+    x_axis = _xAxis(48) 
     myFmt = mdates.DateFormatter('%H:%M')       # format the times into Hour:Minute format
     plt.gcf().autofmt_xdate()                   # automatic rotation of the axis plots
 
@@ -33,28 +255,28 @@ def loadPlotting(net_load_mean, non_disp_load_mean, dom_mean, nondom_mean, ev_me
     ax[0][0].set_xlabel('Time')
     ax[0][0].set_title('Net Load')
     ax[0][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[0][0].grid(b=True)
+    ax[0][0].grid(True)
 
     ax[0][1].plot(x_axis, non_disp_load_mean, 'k')
     ax[0][1].set_ylabel('kWh')
     ax[0][1].set_xlabel('Time')
     ax[0][1].set_title('Current Gross Non-dispatchable Load') # dom + nondom - hydro
     ax[0][1].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[0][1].grid(b=True)
+    ax[0][1].grid(True)
 
     ax[1][0].plot(x_axis, dom_mean, 'k')
     ax[1][0].set_ylabel('kWh')
     ax[1][0].set_xlabel('Time')
     ax[1][0].set_title('Domestic Load')
     ax[1][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[1][0].grid(b=True)
+    ax[1][0].grid(True)
 
     ax[1][1].plot(x_axis, nondom_mean, 'k')
     ax[1][1].set_ylabel('kWh')
     ax[1][1].set_xlabel('Time')
     ax[1][1].set_title('Non-domestic Load')
     ax[1][1].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[1][1].grid(b=True)
+    ax[1][1].grid(True)
     
     ax[2][0].plot(x_axis, ev_mean, 'k')
     ax[2][0].set_ylabel('kWh')
@@ -67,21 +289,23 @@ def loadPlotting(net_load_mean, non_disp_load_mean, dom_mean, nondom_mean, ev_me
     ax[2][1].set_xlabel('Time')
     ax[2][1].set_title('Heat Pump Load')
     ax[2][1].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[2][1].grid(b=True)
+    ax[2][1].grid(True)
     
     return fig
 
 
 def netloadPlotting(mean1, mean2, mean3, mean4, mean5, year):
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
 
     fig,ax =  plt.subplots(nrows=3,ncols=2,sharex=False,sharey=False)
     plt.xticks(rotation=90)
     fig.tight_layout(pad=3.0)
     
-    x_axis = pd.date_range('2020' + '-01-01', periods = 48, freq= '0.5H') 
+    x_axis = _xAxis(48) 
     myFmt = mdates.DateFormatter('%H:%M')       # format the times into Hour:Minute format                  
 
-    x_axis2 = pd.date_range('2020' + '-01-01', periods = 17520, freq= '0.5H') 
+    x_axis2 = _xAxis(17520) 
     myFmt2 = mdates.DateFormatter('%B')         # format the times into Month format
 
     ax[0][0].plot(x_axis, mean1, 'k')
@@ -89,28 +313,28 @@ def netloadPlotting(mean1, mean2, mean3, mean4, mean5, year):
     ax[0][0].set_xlabel('Time')
     #ax[0][0].set_title('1st Quintile Daily Average')
     ax[0][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[0][0].grid(b=True)
+    ax[0][0].grid(True)
 
     ax[0][1].plot(x_axis, mean4, 'k')
     ax[0][1].set_ylabel('Net Load (kWh)')
     ax[0][1].set_xlabel('Time')
     #ax[0][1].set_title('4th Quintile Daily Average') # dom + nondom - hydro
     ax[0][1].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[0][1].grid(b=True)
+    ax[0][1].grid(True)
 
     ax[1][0].plot(x_axis, mean2, 'k')
     ax[1][0].set_ylabel('Net Load (kWh)')
     ax[1][0].set_xlabel('Time')
     #ax[1][0].set_title('2nd Quintile Daily Average')
     ax[1][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[1][0].grid(b=True)
+    ax[1][0].grid(True)
 
     ax[1][1].plot(x_axis, mean5, 'k')
     ax[1][1].set_ylabel('Net Load (kWh)')
     ax[1][1].set_xlabel('Time')
     #ax[1][1].set_title('5th Quintile Daily Average')
     ax[1][1].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[1][1].grid(b=True)
+    ax[1][1].grid(True)
     
     ax[2][0].plot(x_axis, mean3, 'k')
     ax[2][0].set_ylabel('Net Load (kWh)')
@@ -118,24 +342,26 @@ def netloadPlotting(mean1, mean2, mean3, mean4, mean5, year):
     #ax[2][0].set_title('3rd Quintile Daily Average')
     ax[2][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
 
-    ax[2][1].plot(x_axis2, year, 'k')
+    plotSeries(ax[2][1], x_axis2, year, 'k')
     ax[2][1].set_ylabel('Net Load (kWh)')
     #ax[2][1].set_xlabel('Time')
     #ax[2][1].set_title('Annual Variation')
     ax[2][1].xaxis.set_major_formatter(myFmt2)  # apply B format to the x axis data
-    ax[2][1].grid(b=True)
+    ax[2][1].grid(True)
     ax[2][1].tick_params(labelrotation=45)
 
     return fig
 
 
 def genPlotting(hydro_mean, pv_mean, sf_mean, net_load_mean, gross_gen_mean, disp_load_mean):
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
 
     fig,ax =  plt.subplots(nrows=3,ncols=2,sharex=True,sharey=False)
     plt.xticks(rotation=90)
     fig.tight_layout(pad=3.0)
     
-    x_axis = pd.date_range('2020' + '-01-01', periods = 48, freq= '0.5H') 
+    x_axis = _xAxis(48) 
     myFmt = mdates.DateFormatter('%H:%M')       # format the times into Hour:Minute format
     plt.gcf().autofmt_xdate()                   # automatic rotation of the axis plots
 
@@ -144,56 +370,58 @@ def genPlotting(hydro_mean, pv_mean, sf_mean, net_load_mean, gross_gen_mean, dis
     ax[2][0].set_xlabel('Time')
     ax[2][0].set_title('Net Dispatchable Load')
     ax[2][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[2][0].grid(b=True)
+    ax[2][0].grid(True)
 
     ax[1][0].plot(x_axis, gross_gen_mean, 'k')
     ax[1][0].set_ylabel('kWh')
     ax[1][0].set_xlabel('Time')
     ax[1][0].set_title('Gross Generation')
     ax[1][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[1][0].grid(b=True)
+    ax[1][0].grid(True)
 
     ax[0][0].plot(x_axis, net_load_mean, 'k')
     ax[0][0].set_ylabel('kWh')
     ax[0][0].set_xlabel('Time')
     ax[0][0].set_title('Net Load')
     ax[0][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[0][0].grid(b=True)
+    ax[0][0].grid(True)
 
     ax[0][1].plot(x_axis, hydro_mean, 'k')
     ax[0][1].set_ylabel('kWh')
     ax[0][1].set_xlabel('Time')
     ax[0][1].set_title('Hydro Generation')
     ax[0][1].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[0][1].grid(b=True)
+    ax[0][1].grid(True)
 
     ax[1][1].plot(x_axis, pv_mean, 'k')
     ax[1][1].set_ylabel('kWh')
     ax[1][1].set_xlabel('Time')
     ax[1][1].set_title('PV Generation')
     ax[1][1].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[1][1].grid(b=True)
+    ax[1][1].grid(True)
  
     ax[2][1].plot(x_axis, sf_mean, 'k')
     ax[2][1].set_ylabel('kWh')
     ax[2][1].set_xlabel('Time')
     ax[2][1].set_title('Solar Farm Generation')
     ax[2][1].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[2][1].grid(b=True)
+    ax[2][1].grid(True)
     
     return fig
 
 
 def batPlotting(bat1, bat2, bat3, bat4, bat5, year):
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
 
     fig,ax =  plt.subplots(nrows=3,ncols=2,sharex=False,sharey=False)
     plt.xticks(rotation=90)
     fig.tight_layout(pad=3.0)
     
-    x_axis = pd.date_range('2020' + '-01-01', periods = 48, freq= '0.5H') 
+    x_axis = _xAxis(48) 
     myFmt = mdates.DateFormatter('%H:%M')       # format the times into Hour:Minute format
 
-    x_axis2 = pd.date_range('2020' + '-01-01', periods = 17520, freq= '0.5H') 
+    x_axis2 = _xAxis(17520) 
     myFmt2 = mdates.DateFormatter('%B')         # format the times into Month format
 
     ax[2][0].plot(x_axis, bat3, 'k')
@@ -201,54 +429,56 @@ def batPlotting(bat1, bat2, bat3, bat4, bat5, year):
     ax[2][0].set_xlabel('Time of day')
     ax[2][0].set_title('3rd Quintile')
     ax[2][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[2][0].grid(b=True)
+    ax[2][0].grid(True)
 
     ax[1][0].plot(x_axis, bat2, 'k')
     ax[1][0].set_ylabel('kWh')
     ax[1][0].set_xlabel('Time of day')
     ax[1][0].set_title('2nd Quintile')
     ax[1][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[1][0].grid(b=True)
+    ax[1][0].grid(True)
 
     ax[0][0].plot(x_axis, bat1, 'k')
     ax[0][0].set_ylabel('kWh')
     ax[0][0].set_xlabel('Time of day')
     ax[0][0].set_title('1st Quintile')
     ax[0][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[0][0].grid(b=True)
+    ax[0][0].grid(True)
 
     ax[0][1].plot(x_axis, bat4, 'k')
     ax[0][1].set_ylabel('kWh')
     ax[0][1].set_xlabel('Time of day')
     ax[0][1].set_title('4th Quintile')
     ax[0][1].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[0][1].grid(b=True)
+    ax[0][1].grid(True)
 
     ax[1][1].plot(x_axis, bat5, 'k')
     ax[1][1].set_ylabel('kWh')
     ax[1][1].set_xlabel('Time of day')
     ax[1][1].set_title('5th Quintile')
     ax[1][1].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[1][1].grid(b=True)
+    ax[1][1].grid(True)
     
     ax[2][1].plot(x_axis2,'k')
     ax[2][1].set_ylabel('kWh')
     #ax[2][1].set_xlabel('Time')
     ax[2][1].set_title('Overall Annual Operation')
     ax[2][1].xaxis.set_major_formatter(myFmt2)   # apply B format to the x axis data
-    ax[2][1].grid(b=True)
+    ax[2][1].grid(True)
     ax[2][1].tick_params(labelrotation=45)
     
     return fig
 
 
 def emPlotting(emissions1, emissions2, emissions3, emissions4, emissions5, emissions6):
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
 
     fig,ax =  plt.subplots(nrows=3,ncols=2,sharey=False, sharex=False)
     plt.xticks(rotation=90)
     fig.tight_layout(pad=3.0)
     
-    x_axis = pd.date_range('2020' + '-01-01', periods = 48, freq= '0.5H')
+    x_axis = _xAxis(48)
     myFmt = mdates.DateFormatter('%H:%M')       # format the times into Hour:Minute format
     plt.gcf().autofmt_xdate()                   # automatic rotation of the axis plots
 
@@ -257,48 +487,153 @@ def emPlotting(emissions1, emissions2, emissions3, emissions4, emissions5, emiss
     ax[0][0].set_xlabel('Time')
     ax[0][0].set_title('Net Emissions, 1st Quintile Daily Average')
     ax[0][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[0][0].grid(b=True)
+    ax[0][0].grid(True)
 
     ax[1][0].plot(x_axis, emissions2, 'k')
     ax[1][0].set_ylabel('tnCO2')
     ax[1][0].set_xlabel('Time')
     ax[1][0].set_title('Net Emissions, 2nd Quintile Daily Average')
     ax[1][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[1][0].grid(b=True)
+    ax[1][0].grid(True)
 
     ax[2][0].plot(x_axis, emissions3, 'k')
     ax[2][0].set_ylabel('tnCO2')
     ax[2][0].set_xlabel('Time')
     ax[2][0].set_title('Net Emissions, 3rd Quintile Daily Average')
     ax[2][0].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[2][0].grid(b=True)
+    ax[2][0].grid(True)
 
     ax[0][1].plot(x_axis, emissions4, 'k')
     ax[0][1].set_ylabel('tnCO2')
     ax[0][1].set_xlabel('Time')
     ax[0][1].set_title('Net Emissions, 4th Quintile Daily Average')
     ax[0][1].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[0][1].grid(b=True)
+    ax[0][1].grid(True)
 
     ax[1][1].plot(x_axis, emissions5, 'k')
     ax[1][1].set_ylabel('tnCO2')
     ax[1][1].set_xlabel('Time')
     ax[1][1].set_title('Net Emissions, 5th Quintile Daily Average')
     ax[1][1].xaxis.set_major_formatter(myFmt)   # apply HH:MM format to the x axis data
-    ax[1][1].grid(b=True)
+    ax[1][1].grid(True)
 
-    x_axis2 = pd.date_range('2020' + '-01-01', periods = 17520, freq= '0.5H')    # different x-axis for annual data 
+    x_axis2 = _xAxis(17520)    # different x-axis for annual data 
     myFmt2 = mdates.DateFormatter('%B')                                          # format the times into month format
 
-    ax[2][1].plot(x_axis2, emissions6, 'k')
+    plotSeries(ax[2][1], x_axis2, emissions6, 'k')
     ax[2][1].set_ylabel('tnCO2')
     #ax[2][1].set_xlabel('Time')
     ax[2][1].set_title('Net Emissions, Annual')
     ax[2][1].xaxis.set_major_formatter(myFmt2)   # apply HH:MM format to the x axis data
-    ax[2][1].grid(b=True)
+    ax[2][1].grid(True)
     
     return fig
 
 
+def reportFigures(result, emissions=None):
+    """
+    Figure jobs of the standard report of an energy balance
+
+    Parameters
+    ----------
+    result : SimulationResult
+        Result of EnergySystem.basic_energy_balance.
+    emissions : numpy array
+        Optional (T,) net emissions (tnCO2) to add the emissions figure.
+
+    Returns
+    -------
+    dict of figure jobs for renderFigures
+    """
+    import Averaging as AV
+
+    def total(asset_type):
+        names = [n for n in result.columns if n.split('#')[0] == asset_type]
+        return result.getSum(names) if names else np.zeros(result.T)
+
+    net_load = result['net_load']
+    series = {'net_load': net_load,
+              'disp_load': result['disp_load'],
+              'grid_imports': result.grid_imports,
+              'gross_gen': result.gross_gen,
+              'gross_load': result.gross_load,
+              'hydro': total('HYDRO'), 'pv': total('PV'), 'sf': total('SF'),
+              'dom': total('DOMESTIC_LOAD'), 'nondom': total('NON_DOMESTIC_LOAD'),
+              'ev': total('EV_LOAD'), 'hp': total('HEAT_PUMP_LOAD')}
+    names = list(series)
+    profiles, _ = AV.dailyProfiles(np.array([series[n] for n in names]))
+    means = dict(zip(names, profiles['mean']))
+
+    figures = {}
+    for q in range(5):
+        figures['generation_q%d' % (q + 1)] = ('genPlotting', (
+                means['hydro'][q], means['pv'][q], means['sf'][q],
+                means['net_load'][q], means['gross_gen'][q], means['disp_load'][q]))
+        figures['load_q%d' % (q + 1)] = ('loadPlotting', (
+                means['net_load'][q], means['gross_load'][q], means['dom'][q],
+                means['nondom'][q], means['ev'][q], means['hp'][q]))
+    figures['net_load'] = ('netloadPlotting', tuple(means['net_load']) + (net_load,))
+    figures['grid_imports'] = ('netloadPlotting', tuple(means['grid_imports'])
+                               + (series['grid_imports'],))
+    if emissions is not None:
+        emissions_means = AV.Averaging(emissions)
+        figures['emissions'] = ('emPlotting', tuple(emissions_means) + (emissions,))
+    return figures
+
+
+def _initRenderer():
+    """Pool initialiser: draw off-screen with the Agg backend"""
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+
+def _render(job):
+    """Draw one figure job and save it, returning the filepath"""
+    import matplotlib.pyplot as plt
+    name, args, filepath, dpi = job
+    fig = globals()[name](*args)
+    fig.savefig(filepath, dpi=dpi)
+    plt.close(fig)
+    return filepath
+
+
+def renderFigures(figures, out_dir='.', fmt='png', dpi=100, processes=None):
+    """
+    Render figures off-screen straight to files
+
+    Each figure is drawn with the Agg backend in a process pool and
+    saved without being shown, so a full report renders in parallel and
+    without a display.
+
+    Parameters
+    ----------
+    figures : dict
+        File name (without extension) to (plotting function name, args),
+        e.g. {'net_load': ('netloadPlotting', (m1, m2, m3, m4, m5, year))}.
+    out_dir : str
+        Folder to save the figures in, created if missing.
+    fmt : str
+        Image format, e.g. 'png' or 'svg'.
+    dpi : int
+        Resolution of raster formats.
+    processes : int
+        Pool size, defaults to the number of cores; 1 renders in this
+        process.
+
+    Returns
+    -------
+    List of saved filepaths, in the order given
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(name, tuple(args), os.path.join(out_dir, '%s.%s' % (filename, fmt)), dpi)
+            for filename, (name, args) in figures.items()]
+    if processes == 1 or len(jobs) <= 1:
+        if 'matplotlib.pyplot' not in sys.modules:  # keep a caller's backend
+            _initRenderer()
+        return [_render(job) for job in jobs]
+    with mp.Pool(processes, initializer=_initRenderer) as pool:
+        return pool.map(_render, jobs, chunksize=1)
+
+
 if __name__ == "__main__":
     pass
\ No newline at end of file
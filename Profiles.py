@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+3YP profile store module.
+Process-wide cache of the half hourly profiles in data/ shared by every
+asset class. Profiles are keyed by file path, column selection and file
+modification time, handed out as read-only numpy views and evicted on a
+least recently used basis once the store is full.
+
+Every CSV profile can also be ingested into a binary .npy twin in a
+npy/ folder next to it (run this file to ingest data/). When the twin
+exists and is newer than the CSV it is memory-mapped instead of parsing
+the CSV, otherwise the CSV is parsed as before.
+
+A TimeAxis aligns any profile to a simulation time step (5 minutes to
+hourly or longer) with numpy resampling, cached in the store per
+profile and resolution.
+Authors: Mathew Hedges
+"""
+
+__version__ = '0.3'
+
+# import modules
+import os
+from collections import OrderedDict
+
+import glob
+
+import numpy as np
+
+
+BINARY_DIR = 'npy'
+YEAR_HOURS = 24 * 365  # span of every profile in data/
+
+
+def binaryPath(filepath, kind='values'):
+    """
+    Return the path of the binary twin of a CSV profile
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath for the CSV profile
+    kind : str
+        'values' for the numeric columns, 'index' for the date column.
+    """
+    folder, name = os.path.split(filepath)
+    stem = os.path.splitext(name)[0]
+    if kind != 'values':
+        stem = stem + '.' + kind
+    return os.path.join(folder, BINARY_DIR, stem + '.npy')
+
+
+def isFresh(filepath, kind='values'):
+    """Check the binary twin exists and is newer than the CSV"""
+    binary = binaryPath(filepath, kind)
+    try:
+        return os.stat(binary).st_mtime_ns >= os.stat(filepath).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def ingest(filepath):
+    """
+    Convert a CSV profile into its binary twin
+
+    Every column is stored at its CSV position in one column-major float
+    array, non-numeric columns becoming NaN, so a single column maps to a
+    contiguous block of the file. If the first column holds dates they
+    are also stored as a datetime64[ns] index.
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath for the CSV profile
+    """
+    import pandas as pd
+    df = pd.read_csv(filepath)
+    values = np.empty(df.shape, dtype=float, order='F')
+    for i, column in enumerate(df.columns):
+        values[:, i] = pd.to_numeric(df[column], errors='coerce')
+    os.makedirs(os.path.dirname(binaryPath(filepath)), exist_ok=True)
+    np.save(binaryPath(filepath), values)
+
+    if df.dtypes.iloc[0] == object:
+        index = pd.read_csv(filepath, usecols=[0], index_col=0,
+                            parse_dates=True, dayfirst=True).index
+        if isinstance(index, pd.DatetimeIndex):
+            np.save(binaryPath(filepath, 'index'),
+                    index.values.astype('datetime64[ns]'))
+
+
+def ingestAll(data_dir='data'):
+    """
+    Ingest every CSV profile in a folder
+
+    Parameters
+    ----------
+    data_dir : str
+        Folder holding the CSV profiles
+
+    Returns
+    -------
+    List of ingested filepaths
+    """
+    filepaths = sorted(glob.glob(os.path.join(data_dir, '*.csv')))
+    for filepath in filepaths:
+        ingest(filepath)
+    return filepaths
+
+
+class ProfileStore:
+    """
+    Bounded LRU cache of parsed profiles
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of cached entries before the least recently used
+        entry is evicted.
+    """
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, filepath, kind, usecols):
+        path = os.path.abspath(filepath)
+        if usecols is not None:
+            usecols = tuple(usecols)
+        return (path, kind, usecols, os.stat(path).st_mtime_ns)
+
+    def _lookup(self, key, loader):
+        try:
+            array = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            array = loader()
+            self.putEntry(key, array)
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return array.view()
+
+    def getProfile(self, filepath, usecols=None):
+        """
+        Return the numeric columns of a profile
+
+        Parameters
+        ----------
+        filepath : str
+            Filepath for the profile
+        usecols : list of int
+            Column positions to return, as for pandas.read_csv.
+
+        Returns
+        -------
+        profile : numpy array
+            Read-only (T, len(usecols)) view of the profile.
+        """
+        key = self._key(filepath, 'values', usecols)
+
+        def loader():
+            if isFresh(filepath):
+                values = np.asarray(np.load(binaryPath(filepath), mmap_mode='r'))
+                if usecols is None:
+                    return values
+                cols = sorted(usecols)
+                if cols == list(range(cols[0], cols[-1] + 1)):
+                    return values[:, cols[0]:cols[-1] + 1]
+                return values[:, cols]
+            import pandas as pd
+            df = pd.read_csv(filepath, usecols=usecols)
+            return np.ascontiguousarray(df.values, dtype=float)
+
+        return self._lookup(key, loader)
+
+    def getIndex(self, filepath, col=0, dayfirst=True):
+        """
+        Return a date column of a profile
+
+        Parameters
+        ----------
+        filepath : str
+            Filepath for the profile
+        col : int
+            Position of the date column.
+        dayfirst : bool
+            Parse ambiguous dates as DD/MM.
+
+        Returns
+        -------
+        index : numpy array
+            Read-only datetime64[ns] view of the column.
+        """
+        key = self._key(filepath, 'index', (col, dayfirst))
+
+        def loader():
+            if col == 0 and dayfirst and isFresh(filepath, 'index'):
+                return np.asarray(np.load(binaryPath(filepath, 'index'),
+                                          mmap_mode='r'))
+            import pandas as pd
+            df = pd.read_csv(filepath, usecols=[col], index_col=0,
+                             parse_dates=True, dayfirst=dayfirst)
+            return df.index.values.astype('datetime64[ns]')
+
+        return self._lookup(key, loader)
+
+    def getEntries(self):
+        """Return the cached (key, array) pairs, oldest first"""
+        return list(self._entries.items())
+
+    def putEntry(self, key, array):
+        """
+        Seed the store with an already loaded array, e.g. a view of a
+        shared memory block in a worker process.
+        """
+        array.flags.writeable = False
+        self._entries[key] = array
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Empty the store"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+store = ProfileStore()
+getProfile = store.getProfile
+getIndex = store.getIndex
+
+
+def regularGrid(times, values, step):
+    """
+    Place timestamped samples on a regular grid from the first timestamp,
+    averaging samples that share a slot and linearly interpolating empty
+    slots, e.g. the hour repeated and the hour lost at clock changes.
+
+    Parameters
+    ----------
+    times : numpy array
+        (n,) datetime64 sample times.
+    values : numpy array
+        (n,) samples.
+    step : float
+        Grid step (hours).
+
+    Returns
+    -------
+    grid : numpy array
+    """
+    offsets = (times - times[0]) / np.timedelta64(int(round(step * 3600)), 's')
+    slots = np.floor(offsets).astype(int)
+    n = slots[-1] + 1
+    counts = np.bincount(slots, minlength=n)
+    totals = np.bincount(slots, weights=values, minlength=n)
+    known = counts > 0
+    grid = np.empty(n)
+    grid[known] = totals[known] / counts[known]
+    grid[~known] = np.interp(np.flatnonzero(~known), np.flatnonzero(known),
+                             grid[known])
+    return grid
+
+
+class TimeAxis:
+    """
+    Regular simulation time axis
+
+    Profiles are aligned to it with resample, by one of three kinds:
+    'interp' treats values as point samples at the start of each native
+    step and interpolates linearly (the final value is held), 'mean'
+    treats them as averages over each step (kW) and 'sum' as energies per
+    step (kWh); both of the latter conserve energy.
+
+    Parameters
+    ----------
+    dt : float
+        Time interval (hours)
+    T : int
+        Number of intervals, defaults to a 365 day year.
+    """
+
+    def __init__(self, dt=0.5, T=None):
+        self.dt = dt
+        self.T = int(round(YEAR_HOURS / dt)) if T is None else int(T)
+
+    def __repr__(self):
+        return 'TimeAxis(dt=%r, T=%r)' % (self.dt, self.T)
+
+    def __eq__(self, other):
+        return (isinstance(other, TimeAxis)
+                and (self.dt, self.T) == (other.dt, other.T))
+
+    def __hash__(self):
+        return hash((self.dt, self.T))
+
+    @property
+    def stepsPerDay(self):
+        return int(round(24 / self.dt))
+
+    def resample(self, values, kind='mean', step=None):
+        """
+        Align a series to the axis
+
+        Parameters
+        ----------
+        values : array_like
+            (n,) or (n, 1) series from time 0.
+        kind : str
+            'interp', 'mean' or 'sum', see the class docstring.
+        step : float
+            Native step of the series (hours), by default the series
+            spans a 365 day year.
+
+        Returns
+        -------
+        (T,) numpy array
+        """
+        values = np.asarray(values, dtype=float).reshape(-1)
+        n = len(values)
+        step = YEAR_HOURS / n if step is None else step
+        dt, T = self.dt, self.T
+        if kind == 'sum':
+            return self.resample(values / step, 'mean', step) * dt
+        if kind not in ('mean', 'interp'):
+            raise ValueError("kind must be 'interp', 'mean' or 'sum', not %r" % kind)
+
+        if np.isclose(step, dt) and n >= T:
+            return values[:T].copy()
+        if kind == 'interp':
+            return np.interp(np.arange(T) * dt, np.arange(n) * step, values)
+        if T * dt > n * step * (1 + 1e-9):
+            raise ValueError('axis of %g h is longer than the %g h series'
+                             % (T * dt, n * step))
+        ratio = step / dt
+        if np.isclose(ratio, round(ratio)):                     # whole number of intervals per step
+            return np.repeat(values, int(round(ratio)))[:T]
+        ratio = dt / step
+        if np.isclose(ratio, round(ratio)):                     # whole number of steps per interval
+            r = int(round(ratio))
+            return values[:T * r].reshape(T, r).mean(axis=1)
+        energy = np.concatenate([[0], np.cumsum(values * step)])
+        edges = np.interp(np.arange(T + 1) * dt, np.arange(n + 1) * step, energy)
+        return np.diff(edges) / dt
+
+    def getProfile(self, filepath, usecols=None, kind='mean', timestamped=False,
+                   store=store):
+        """
+        Profile from the store aligned to the axis, cached per profile,
+        kind and resolution
+
+        Parameters
+        ----------
+        filepath : str
+            Filepath for the profile
+        usecols : list of int
+            Column positions, as for getProfile.
+        kind : str
+            'interp', 'mean' or 'sum', see the class docstring.
+        timestamped : bool
+            Place the samples by the date column first (see regularGrid),
+            for profiles with clock change gaps or repeats.
+
+        Returns
+        -------
+        profile : numpy array
+            Read-only (T, len(usecols)) aligned profile.
+        """
+        key = store._key(filepath, ('aligned', kind, timestamped, self.dt, self.T),
+                         usecols)
+
+        def loader():
+            values = store.getProfile(filepath, usecols)
+            step = None
+            if timestamped:
+                times = store.getIndex(filepath)
+                step = np.median(np.diff(times)) / np.timedelta64(1, 'h')
+                values = np.column_stack([regularGrid(times, column, step)
+                                          for column in values.T])
+            return np.column_stack([self.resample(column, kind, step)
+                                    for column in values.T])
+
+        return store._lookup(key, loader)
+
+
+def cycleSlice(series, start, stop):
+    """
+    Intervals start to stop of a series repeated end to end, e.g. a year
+    long profile in a multi-year run
+
+    Parameters
+    ----------
+    series : array_like
+        (n,) or (n, 1) series, may be a memory-mapped array.
+    start, stop : int
+        Interval range, stop may exceed n.
+
+    Returns
+    -------
+    (stop - start,) numpy array
+    """
+    n = len(series)
+    a = start % n
+    if a + stop - start <= n:
+        values = series[a:a + stop - start]
+    else:
+        values = np.take(series, np.arange(start, stop) % n, axis=0)
+    return np.array(values, dtype=float).reshape(-1)
+
+
+def iterChunks(series, chunk, T=None):
+    """
+    Yield a series in chunks of at most chunk intervals, repeating it
+    end to end up to T intervals; only one chunk is copied at a time,
+    so memory-mapped sources are read piecewise.
+
+    Parameters
+    ----------
+    series : array_like
+        (n,) or (n, 1) series, e.g. np.load(path, mmap_mode='r').
+    chunk : int
+        Intervals per chunk, the last chunk may be shorter.
+    T : int
+        Total intervals, the length of the series by default.
+
+    Yields
+    ------
+    (n,) numpy array
+    """
+    T = len(series) if T is None else T
+    for start in range(0, T, chunk):
+        yield cycleSlice(series, start, min(start + chunk, T))
+
+
+_axes = {}
+
+
+def getTimeAxis(dt):
+    """
+    Year long TimeAxis of a time interval, shared by every caller, or dt
+    itself if it is already a TimeAxis
+    """
+    if isinstance(dt, TimeAxis):
+        return dt
+    if dt not in _axes:
+        _axes[dt] = TimeAxis(dt)
+    return _axes[dt]
+
+
+if __name__ == "__main__":
+    for filepath in ingestAll():
+        print('ingested', filepath)
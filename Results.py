@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+3YP sweep result store.
+Append-only SQLite table of sweep results keyed by a content hash of
+each scenario's parameters. Parameters and KPIs are stored as columns,
+parameter columns are indexed, so finished points can be skipped on a
+restart and results queried without loading the whole table.
+Authors: Mathew Hedges
+"""
+
+__version__ = '0.1'
+
+# import modules
+import hashlib
+import json
+import re
+import sqlite3
+
+
+def pointKey(params, scenario=''):
+    """
+    Content hash of a scenario's parameters
+
+    Parameters
+    ----------
+    params : dict
+        The point's parameters.
+    scenario : str
+        Name of the scenario builder, so equal parameters of different
+        scenarios do not collide.
+
+    Returns
+    -------
+    Hex digest : str
+    """
+    text = json.dumps([scenario, params], sort_keys=True, default=float)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def _column(name):
+    return '"%s"' % re.sub(r'\W', '_', str(name))
+
+
+class ResultStore:
+    """
+    Append-only store of sweep results
+
+    Parameters
+    ----------
+    filepath : str
+        SQLite database file, created if missing.
+    scenario : str
+        Name of the scenario builder the results belong to.
+    """
+    def __init__(self, filepath, scenario=''):
+        self.filepath = filepath
+        self.scenario = scenario
+        self.db = sqlite3.connect(filepath)
+        self.db.execute('CREATE TABLE IF NOT EXISTS results ('
+                        'key TEXT PRIMARY KEY, scenario TEXT, params TEXT)')
+        self.db.commit()
+
+    def _columns(self):
+        return {row[1] for row in self.db.execute('PRAGMA table_info(results)')}
+
+    def _addColumns(self, names, index=False):
+        existing = self._columns()
+        for name in names:
+            col = _column(name)
+            if col.strip('"') in existing:
+                continue
+            self.db.execute('ALTER TABLE results ADD COLUMN %s' % col)
+            if index:
+                self.db.execute('CREATE INDEX IF NOT EXISTS %s ON results (%s)'
+                                % (_column('idx_' + col.strip('"')), col))
+
+    def keys(self):
+        """Return the set of stored point keys"""
+        return {row[0] for row in self.db.execute('SELECT key FROM results')}
+
+    def get(self, keys):
+        """
+        Fetch stored results by point key
+
+        Parameters
+        ----------
+        keys : list of str
+            Point keys, see pointKey.
+
+        Returns
+        -------
+        dict of key to {column: value} for the keys that are stored
+        """
+        keys = list(keys)
+        found = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            cursor = self.db.execute('SELECT * FROM results WHERE key IN (%s)'
+                                     % ', '.join(['?'] * len(chunk)), chunk)
+            names = [d[0] for d in cursor.description]
+            for values in cursor:
+                row = dict(zip(names, values))
+                key = row.pop('key')
+                found[key] = {n: v for n, v in row.items()
+                              if n not in ('scenario', 'params')
+                              and v is not None}
+        return found
+
+    def has(self, params):
+        """Check a point has already been computed"""
+        row = self.db.execute('SELECT 1 FROM results WHERE key = ?',
+                              (pointKey(params, self.scenario),)).fetchone()
+        return row is not None
+
+    def put(self, rows, param_names):
+        """
+        Append result rows and commit them (a checkpoint)
+
+        Parameters
+        ----------
+        rows : list of dict
+            Parameters and KPIs of each point.
+        param_names : list
+            Which row entries are parameters (indexed) rather than KPIs.
+        """
+        if not rows:
+            return
+        names = list(rows[0])
+        self._addColumns(param_names, index=True)
+        self._addColumns([n for n in names if n not in param_names])
+        cols = ', '.join(['key', 'scenario', 'params'] + [_column(n) for n in names])
+        marks = ', '.join(['?'] * (len(names) + 3))
+        values = []
+        for row in rows:
+            params = {n: row[n] for n in param_names}
+            values.append([pointKey(params, self.scenario), self.scenario,
+                           json.dumps(params, sort_keys=True, default=float)]
+                          + [float(row[n]) if hasattr(row[n], 'dtype') else row[n]
+                             for n in names])
+        self.db.executemany('INSERT OR IGNORE INTO results (%s) VALUES (%s)'
+                            % (cols, marks), values)
+        self.db.commit()
+
+    def query(self, where=None, args=(), columns='*'):
+        """
+        Select results with an SQL condition
+
+        Parameters
+        ----------
+        where : str
+            Condition on parameter/KPI columns, e.g. 'prop_top > ?'.
+        args : tuple
+            Values for the condition's placeholders.
+        columns : str
+            Columns to return.
+
+        Returns
+        -------
+        results : DataFrame
+        """
+        import pandas as pd
+        sql = 'SELECT %s FROM results WHERE scenario = ?' % columns
+        if where:
+            sql += ' AND (%s)' % where
+        return pd.read_sql_query(sql, self.db, params=(self.scenario,) + tuple(args))
+
+    def close(self):
+        self.db.close()
+
+
+if __name__ == "__main__":
+    pass
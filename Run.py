@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+3YP headless batch runner.
+Runs a named scenario from Scenarios.SCENARIOS without any plotting and
+writes its KPIs and half hourly series to an output folder, e.g.
+
+    python Run.py 2050 --out runs/2050 --set capacity2=4200
+
+matplotlib and the Plotting module are only imported with --plots, in
+which case the report figures are rendered off-screen in parallel and
+saved as PNGs rather than shown.
+With --stream the balance is run a chunk at a time (see
+EnergySystem.stream_energy_balance): KPIs are aggregated and the series
+appended to disk as chunks complete, so long runs at fine time steps
+stay within constant memory, e.g.
+
+    python Run.py 2050 --stream --years 30 --set dt=0.25 --format npz
+
+Start-up, build, balance and write times are appended to a timings
+file so the cold start-up cost can be tracked between versions.
+Authors: Mathew Hedges
+"""
+
+__version__ = '0.1'
+
+# import modules
+import time
+_t0 = time.perf_counter()
+
+import argparse
+import csv
+import inspect
+import json
+import os
+import sys
+
+
+def parseValue(text):
+    """Parse a --set value as int, float or bool, else keep the string"""
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    if text.lower() in ('true', 'false'):
+        return text.lower() == 'true'
+    return text
+
+
+def parseArgs(argv=None):
+    parser = argparse.ArgumentParser(
+            description='Run a 3YP scenario headless and write its results.')
+    parser.add_argument('scenario',
+                        help="scenario name, e.g. '2020', '2050' or 'dsr2050'")
+    parser.add_argument('--out', default=None,
+                        help='output folder (default runs/<scenario>)')
+    parser.add_argument('--set', dest='params', action='append', default=[],
+                        metavar='NAME=VALUE',
+                        help='override a scenario parameter, may be repeated')
+    parser.add_argument('--format', choices=('csv', 'npz'), default='csv',
+                        help='file format of the series (npz is written as a '
+                             'memory-mapped .npy with --stream)')
+    parser.add_argument('--loss', type=float, default=0.08,
+                        help='grid losses for emissions')
+    parser.add_argument('--export-rate', type=float, default=0.055,
+                        help='price paid for exports, p/kWh')
+    parser.add_argument('--plots', action='store_true',
+                        help='also save the headline figures as PNGs')
+    parser.add_argument('--stream', action='store_true',
+                        help='balance in chunks with constant memory')
+    parser.add_argument('--years', type=float, default=1,
+                        help='run length with --stream, profiles repeat each year')
+    parser.add_argument('--chunk', type=int, default=None,
+                        help='intervals per chunk with --stream (default a week)')
+    parser.add_argument('--timings', default=None,
+                        help='timings log to append to (default <out>/timings.csv)')
+    return parser.parse_args(argv)
+
+
+def writeSeries(result, filepath, fmt='csv'):
+    """
+    Write every column of a SimulationResult
+
+    Parameters
+    ----------
+    result : SimulationResult
+        Result of the energy balance.
+    filepath : str
+        Output filepath without extension.
+    fmt : str
+        'csv' (one column per series) or 'npz'.
+
+    Returns
+    -------
+    Filepath written
+    """
+    import numpy as np
+    if fmt == 'npz':
+        filepath += '.npz'
+        np.savez(filepath, columns=np.array(result.columns), data=result.data)
+    else:
+        filepath += '.csv'
+        header = ','.join(['interval'] + list(result.columns))
+        table = np.column_stack([np.arange(result.T), result.data.T])
+        np.savetxt(filepath, table, delimiter=',', header=header,
+                   comments='', fmt=['%d'] + ['%.10g'] * len(result.columns))
+    return filepath
+
+
+def streamSeries(system, filepath, fmt='csv', years=1, chunk=None,
+                 loss=0.08, export_rate=0.055):
+    """
+    Stream the energy balance of a system to disk
+
+    Parameters
+    ----------
+    system : EnergySystem
+        The system, built for one year.
+    filepath : str
+        Output filepath of the series without extension.
+    fmt : str
+        'csv' or 'npz', written as a memory-mapped .npy.
+    years : float
+        Run length in years.
+    chunk : int
+        Intervals per chunk.
+
+    Returns
+    -------
+    kpis : dict
+        As Sweep.defaultKpis, totals over the run.
+    """
+    import EnergySystem as ES
+    import Streaming as ST
+    T = int(round(years * system.T))
+    columns = ES.SimulationResult(system.nondispat, system.dispat,
+                                  system.dt, 0).columns
+    aggregator = ST.kpiAggregator(system, loss, export_rate)
+    writer = ST.SeriesWriter(filepath, columns, T,
+                             'csv' if fmt == 'csv' else 'npy')
+    system.stream_energy_balance([aggregator, writer], chunk, T)
+    writer.close()
+    return aggregator.getKpis()
+
+
+def savePlots(result, out, emissions=None, processes=None):
+    """Render the standard report figures of a result as PNGs"""
+    import Plotting as PT
+    return PT.renderFigures(PT.reportFigures(result, emissions), out,
+                            processes=processes)
+
+
+def logTimings(filepath, timings):
+    """Append one row of timings to a CSV log, writing a header if new"""
+    new = not os.path.exists(filepath)
+    with open(filepath, 'a', newline='') as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(timings))
+        if new:
+            writer.writeheader()
+        writer.writerow(timings)
+
+
+def main(argv=None):
+    args = parseArgs(argv)
+    t_parsed = time.perf_counter()
+
+    import Scenarios as SC
+    import Sweep as SW
+    t_imported = time.perf_counter()
+
+    if args.scenario not in SC.SCENARIOS:
+        sys.exit("unknown scenario '%s', choose from %s"
+                 % (args.scenario, ', '.join(SC.SCENARIOS)))
+    params = {}
+    for item in args.params:
+        name, _, value = item.partition('=')
+        params[name] = parseValue(value)
+    builder = SC.SCENARIOS[args.scenario]
+    names = inspect.signature(builder).parameters
+    unknown = sorted(set(params) - set(names))
+    if unknown:
+        sys.exit("unknown parameter(s) %s for scenario '%s', choose from %s"
+                 % (', '.join(unknown), args.scenario, ', '.join(names)))
+
+    if args.stream and args.plots:
+        sys.exit('--plots needs the full series, it cannot be used with --stream')
+    system = builder(**params)
+    t_built = time.perf_counter()
+    out = args.out or os.path.join('runs', args.scenario)
+    os.makedirs(out, exist_ok=True)
+    if args.stream:
+        kpis = streamSeries(system, os.path.join(out, 'series'), args.format,
+                            args.years, args.chunk, args.loss, args.export_rate)
+        t_balanced = time.perf_counter()                        # series are written as they stream
+    else:
+        result = system.basic_energy_balance()
+        t_balanced = time.perf_counter()
+        kpis = SW.defaultKpis(system, result, args.loss, args.export_rate)
+    with open(os.path.join(out, 'kpis.json'), 'w') as handle:
+        json.dump({'scenario': args.scenario, 'params': params,
+                   'kpis': {k: float(v) for k, v in kpis.items()}},
+                  handle, indent=2)
+    if not args.stream:
+        writeSeries(result, os.path.join(out, 'series'), args.format)
+    if args.plots:
+        import Emissions as EM
+        emissions = EM.Emissions(args.loss).getEmissions(
+                result['net_load'], profile=True, dt=system.dt)['profile']
+        savePlots(result, out, emissions)
+    t_written = time.perf_counter()
+
+    timings = {'version': __version__,
+               'scenario': args.scenario,
+               'startup': t_parsed - _t0,
+               'imports': t_imported - t_parsed,
+               'build': t_built - t_imported,
+               'balance': t_balanced - t_built,
+               'write': t_written - t_balanced,
+               'total': t_written - _t0,
+               'matplotlib': 'matplotlib' in sys.modules}
+    logTimings(args.timings or os.path.join(out, 'timings.csv'), timings)
+
+    for name, value in kpis.items():
+        print('%s: %.6g' % (name, value))
+    print('total time: %.3f s' % timings['total'])
+    return kpis
+
+
+if __name__ == "__main__":
+    main()
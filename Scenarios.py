@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+3YP scenario builders.
+Each builder sets up the Kennington assets of one of the main files as
+an EnergySystem, with the swept quantities exposed as keyword
+parameters so sweeps and batch runs can rebuild them cheaply. The
+builders are registered by name in SCENARIOS for the command line.
+Authors: Mathew Hedges
+"""
+
+__version__ = '0.1'
+
+# import modules
+import Assets as AS
+import EnergySystem as ES
+import Profiles as PF
+
+
+def kennington2020(nInstallations=0.028*1985, nPanels=40000, total_nCars=67,
+                   night_charge=1, capacity2=5000, power2=1000, dt=30/60):
+    """
+    Kennington c. 2020 (3YP_2020.py)
+
+    Parameters
+    ----------
+    nInstallations : float
+        Number of domestic PV installations (and domestic batteries).
+    nPanels : int
+        Number of solar farm panels.
+    total_nCars : int
+        Number of EVs.
+    night_charge : float
+        Proportion of EVs charging at night.
+    capacity2 : float
+        Community battery capacity, kWh.
+    power2 : float
+        Community battery power, kW.
+    dt : float
+        Time interval (hours)
+
+    Returns
+    -------
+    energy_system : EnergySystem
+    """
+    T = PF.TimeAxis(dt).T     # Number of intervals per year
+    dispatchable = []
+    non_dispatchable = []
+
+    nHouseholds = 1985
+
+    # PV Generation
+    non_dispatchable.append(AS.pvAsset(4, nInstallations))                      # domestic solar PV
+    non_dispatchable.append(AS.sfAsset(0.45, nPanels, 0))                        # solar PV farm
+
+    # Hydro Generation
+    non_dispatchable.append(AS.hydroAsset(450, 'data/Sandford_hydro_generation_30_min_date.csv'))
+
+    # Domestic, Non-Domestic and School Loads
+    non_dispatchable.append(AS.loadAsset(nHouseholds, 'data/ken_dom_annual_demand_per_household_3.csv'))
+    non_dispatchable.append(AS.ndAsset(32, 'data/ken_non_dom_annual_demand_per_user_3.csv'))
+    non_dispatchable.append(AS.ndAsset(2, 'data/school_annual_demand.csv'))
+
+    # EV Night and Day Charging Loads
+    nCars_night = night_charge * total_nCars
+    non_dispatchable.append(AS.evAsset(nCars_night, 'data/EV_Demand_night_1.csv'))
+    non_dispatchable.append(AS.evAsset(total_nCars - nCars_night, 'data/EV_Demand_day_1.csv'))
+
+    # Heat Pump Loads - central, domestic and non-domestic shoebox
+    nPumps = 1
+    non_dispatchable.append(AS.hpAsset(nPumps, 'data/centralheatpump.csv'))
+    non_dispatchable.append(AS.hpAsset(nHouseholds, 'data/domestic_demand.csv'))
+    non_dispatchable.append(AS.hpAsset(nPumps, 'data/nondomestic_demand.csv'))
+
+    # Battery Storage - 2nd life EVs, community battery and V2G
+    dispatchable.append(AS.PracticalBatteryAsset1(dt, T, 40*(1-0.2723), 50, 0.8, nInstallations))
+    dispatchable.append(AS.PracticalBatteryAsset2(dt, T, capacity2, power2, 1, 1))
+    dispatchable.append(AS.PracticalBatteryAsset3(dt, T, 40, 50, 1, 1))
+
+    return ES.EnergySystem(non_dispatchable, dispatchable, dt, T)
+
+
+def kennington2050(nPanels=50000, night_charge=1, capacity2=5000, power2=1000,
+                   nUsers3=2574, dt=30/60):
+    """
+    Kennington c. 2050 (3YP_2050.py)
+
+    Parameters
+    ----------
+    nPanels : int
+        Number of solar farm panels.
+    night_charge : float
+        Proportion of EVs charging at night.
+    capacity2 : float
+        Community battery capacity, kWh.
+    power2 : float
+        Community battery power, kW.
+    nUsers3 : int
+        Number of V2G EVs.
+    dt : float
+        Time interval (hours)
+
+    Returns
+    -------
+    energy_system : EnergySystem
+    """
+    T = PF.TimeAxis(dt).T     # Number of intervals per year
+    dispatchable = []
+    non_dispatchable = []
+
+    nHouseholds = 2574
+
+    # PV Generation
+    non_dispatchable.append(AS.pvAsset(4, nHouseholds))                         # domestic solar PV
+    non_dispatchable.append(AS.sfAsset(0.45, nPanels, 0))                        # solar PV farm
+
+    # Hydro Generation
+    non_dispatchable.append(AS.hydroAsset(450, 'data/gen_2050_export_df_v1.csv'))
+
+    # Domestic, Non-Domestic and School Loads
+    non_dispatchable.append(AS.loadAsset(nHouseholds, 'data/ideal_domestic_demand_per_household_v1.csv'))
+    non_dispatchable.append(AS.ndAsset(41, 'data/ken_non_dom_annual_demand_per_user_3.csv'))
+    non_dispatchable.append(AS.ndAsset(3, 'data/school_annual_demand.csv'))
+
+    # EV Night and Day Charging Loads
+    total_nCars = 3614
+    nCars_night = night_charge * total_nCars
+    non_dispatchable.append(AS.evAsset(nCars_night, 'data/EV_Demand_night_1.csv'))
+    non_dispatchable.append(AS.evAsset(total_nCars - nCars_night, 'data/EV_Demand_day_1.csv'))
+
+    # Heat Pump Loads - central, domestic and non-domestic shoebox
+    nPumps = 1
+    non_dispatchable.append(AS.hpAsset(nPumps, 'data/centralheatpump.csv'))
+    non_dispatchable.append(AS.hpAsset(nHouseholds, 'data/domestic_demand.csv'))
+    non_dispatchable.append(AS.hpAsset(nPumps * (46/36), 'data/nondomestic_demand.csv'))
+
+    # Battery Storage - 2nd life EVs, community battery and V2G
+    dispatchable.append(AS.PracticalBatteryAsset1(dt, T, 40*(1-0.2723), 50, 0.8, nHouseholds))
+    dispatchable.append(AS.PracticalBatteryAsset2(dt, T, capacity2, power2, 1, 1))
+    dispatchable.append(AS.PracticalBatteryAsset3(dt, T, 40, 50, 1, nUsers3))
+
+    return ES.EnergySystem(non_dispatchable, dispatchable, dt, T)
+
+
+def dsr2050(prop_top=0.01, prop_bottom=0, night_charge=0.89,
+            capacity2=4200, power2=500, dt=30/60):
+    """
+    Kennington c. 2050 with demand side response households
+    (3YP_2050_DSR.py)
+
+    Parameters
+    ----------
+    prop_top : float
+        Proportion of top responder households.
+    prop_bottom : float
+        Proportion of bottom responder households.
+    night_charge : float
+        Proportion of EVs charging at night.
+    capacity2 : float
+        Community battery capacity, kWh.
+    power2 : float
+        Community battery power, kW.
+    dt : float
+        Time interval (hours)
+
+    Returns
+    -------
+    energy_system : EnergySystem
+    """
+    T = PF.TimeAxis(dt).T     # Number of intervals per year
+    dispatchable = []
+    non_dispatchable = []
+
+    nHouseholds = 2574
+
+    # PV Generation
+    non_dispatchable.append(AS.pvAsset(4, 2574))                                # domestic solar PV
+    non_dispatchable.append(AS.sfAsset(0.45, 50000, 0))                          # solar PV farm
+
+    # Hydro Generation
+    non_dispatchable.append(AS.hydroAsset(450, 'data/gen_2050_export_df_v1.csv'))
+
+    # Domestic Loads - top, bottom and normal responders
+    nHouseholds_top = int(nHouseholds * prop_top)
+    nHouseholds_bottom = int(nHouseholds * prop_bottom)
+    nHouseholds_normal = nHouseholds - nHouseholds_top - nHouseholds_bottom
+    non_dispatchable.append(AS.loadAsset(nHouseholds_top, 'data/ideal_domestic_demand_top_v2.csv'))
+    non_dispatchable.append(AS.loadAsset(nHouseholds_bottom, 'data/ideal_domestic_demand_bottom_v2.csv'))
+    non_dispatchable.append(AS.loadAsset(nHouseholds_normal, 'data/ken_dom_annual_demand_per_household_3.csv'))
+
+    # Non-Domestic and School Loads
+    non_dispatchable.append(AS.ndAsset(41, 'data/ken_non_dom_annual_demand_per_user_3.csv'))
+    non_dispatchable.append(AS.ndAsset(3, 'data/school_annual_demand.csv'))
+
+    # EV Night and Day Charging Loads
+    total_nCars = 3614
+    nCars_night = night_charge * total_nCars
+    non_dispatchable.append(AS.evAsset(nCars_night, 'data/EV_Demand_night_1.csv'))
+    non_dispatchable.append(AS.evAsset(total_nCars - nCars_night, 'data/EV_Demand_day_1.csv'))
+
+    # Heat Pump Loads - central, domestic and non-domestic shoebox
+    nPumps = 1
+    non_dispatchable.append(AS.hpAsset(nPumps, 'data/centralheatpump.csv'))
+    non_dispatchable.append(AS.hpAsset(nHouseholds, 'data/domestic_demand.csv'))
+    non_dispatchable.append(AS.hpAsset(nPumps * (46/36), 'data/nondomestic_demand.csv'))
+
+    # Battery Storage - 2nd life EVs, community battery and V2G
+    dispatchable.append(AS.PracticalBatteryAsset1(dt, T, 40*(1-0.2723), 50, 0.8, 2574))
+    dispatchable.append(AS.PracticalBatteryAsset2(dt, T, capacity2, power2, 1, 1))
+    dispatchable.append(AS.PracticalBatteryAsset3(dt, T, 40, 50, 1, 2574))
+
+    return ES.EnergySystem(non_dispatchable, dispatchable, dt, T)
+
+
+SCENARIOS = {'2020': kennington2020,
+             '2050': kennington2050,
+             'dsr2050': dsr2050}
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+3YP streaming result module.
+Sinks for EnergySystem.stream_energy_balance, which balances a run one
+chunk of intervals at a time: KpiAggregator accumulates the headline
+KPIs as chunks arrive and SeriesWriter appends every series to a CSV or
+memory-mapped .npy file. Peak memory is set by the chunk length, not
+the length of the run, so multi-year and minute resolution runs fit.
+Authors: Mathew Hedges
+"""
+
+__version__ = '0.1'
+
+# import modules
+import numpy as np
+
+import Profiles as PF
+
+
+class KpiAggregator:
+    """
+    Incremental KPIs of a streamed run
+
+    Gives the KPIs of SimulationResult.getKpis, plus emissions and grid
+    cost if an intensity or import price is given, without keeping the
+    series.
+
+    Parameters
+    ----------
+    price : array_like
+        Import price of each interval (p/kWh), repeated end to end over
+        the run, e.g. a year of marketObject.mip.
+    intensity : array_like
+        Carbon intensity of consumption of each interval (gCO2/kWh),
+        repeated likewise.
+    export_rate : float
+        Price paid for exports (p/kWh), as Sweep.defaultKpis.
+    series : str
+        Column of the chunk results aggregated.
+    """
+    def __init__(self, price=None, intensity=None, export_rate=0.055,
+                 series='net_load'):
+        self.price = None if price is None else np.asarray(price, dtype=float).reshape(-1)
+        self.intensity = None if intensity is None else np.asarray(intensity, dtype=float).reshape(-1)
+        self.export_rate = export_rate
+        self.series = series
+        self.T = 0
+        self.totals = {'net_load': 0.0, 'imports': 0.0, 'exports': 0.0,
+                       'peak_import': -np.inf, 'import_intervals': 0,
+                       'emissions': 0.0, 'grid_cost': 0.0}
+
+    def add(self, start, result):
+        """Accumulate the chunk result starting at interval start"""
+        net = result[self.series]
+        stop = start + len(net)
+        totals = self.totals
+        totals['net_load'] += net.sum()
+        totals['imports'] += net[net > 0].sum()
+        totals['exports'] -= net[net < 0].sum()
+        totals['peak_import'] = max(totals['peak_import'], net.max())
+        totals['import_intervals'] += np.count_nonzero(net > 0)
+        if self.intensity is not None:
+            totals['emissions'] += net @ PF.cycleSlice(self.intensity, start, stop) / 1000000  # tnCO2
+        if self.price is not None:
+            price = np.where(net >= 0, PF.cycleSlice(self.price, start, stop),
+                             self.export_rate)
+            totals['grid_cost'] += net @ price / 100  # £
+        self.T += len(net)
+
+    def getKpis(self):
+        """
+        Return the KPIs of the chunks added so far
+
+        Returns
+        -------
+        dict of KPIs, energies in kWh
+        """
+        totals = self.totals
+        kpis = {'net_load': totals['net_load'],
+                'imports': totals['imports'],
+                'exports': totals['exports'],
+                'peak_import': totals['peak_import'],
+                'import_fraction': totals['import_intervals'] / max(self.T, 1)}
+        if self.intensity is not None:
+            kpis['emissions'] = totals['emissions']
+        if self.price is not None:
+            kpis['grid_cost'] = totals['grid_cost']
+        return kpis
+
+    def close(self):
+        pass
+
+
+def kpiAggregator(system, loss=0.08, export_rate=0.055):
+    """
+    KpiAggregator matching Sweep.defaultKpis of a system: market
+    imbalance import prices and the carbon intensity of consumption,
+    both averaged onto the system's time step.
+
+    Parameters
+    ----------
+    system : EnergySystem
+        The system to be streamed.
+    loss : float
+        Grid losses between generation and consumption.
+    export_rate : float
+        Price paid for exports (p/kWh), as Sweep.defaultKpis.
+
+    Returns
+    -------
+    KpiAggregator
+    """
+    import Market as MK
+    import Emissions as EM
+    year = PF.getTimeAxis(system.dt)
+    price = year.resample(MK.marketObject(None).mip, 'mean', step=0.5)
+    intensity = year.resample(EM.Emissions(loss).getEmissionIntensity(),
+                              'mean', step=0.5)
+    return KpiAggregator(price, intensity, export_rate)
+
+
+class SeriesWriter:
+    """
+    Append every series of a streamed run to disk
+
+    'csv' writes the same table as Run.writeSeries, one chunk of rows
+    at a time. 'npy' writes a memory-mapped (T,) structured array with
+    one float field per series, read back lazily with
+    np.load(filepath, mmap_mode='r')['net_load'].
+
+    Parameters
+    ----------
+    filepath : str
+        Output filepath without extension.
+    columns : list of str
+        Series names, SimulationResult.columns.
+    T : int
+        Intervals in the run, needed up front for 'npy'.
+    fmt : str
+        'csv' or 'npy'.
+    """
+    def __init__(self, filepath, columns, T=None, fmt='csv'):
+        self.columns = list(columns)
+        self.fmt = fmt
+        self.filepath = filepath + '.' + fmt
+        if fmt == 'npy':
+            if T is None:
+                raise ValueError("the 'npy' format needs the run length T")
+            dtype = np.dtype([(name, float) for name in self.columns])
+            self.data = np.lib.format.open_memmap(self.filepath, mode='w+',
+                                                  dtype=dtype, shape=(T,))
+            self.table = self.data.view(float).reshape(T, len(self.columns))
+        elif fmt == 'csv':
+            self.handle = open(self.filepath, 'w')
+            self.handle.write(','.join(['interval'] + self.columns) + '\n')
+            self.fmt_row = ['%d'] + ['%.10g'] * len(self.columns)
+        else:
+            raise ValueError("fmt must be 'csv' or 'npy', not %r" % fmt)
+
+    def add(self, start, result):
+        """Write the chunk result starting at interval start"""
+        stop = start + result.T
+        if self.fmt == 'npy':
+            self.table[start:stop] = result.data.T
+        else:
+            table = np.column_stack([np.arange(start, stop), result.data.T])
+            np.savetxt(self.handle, table, delimiter=',', fmt=self.fmt_row)
+
+    def close(self):
+        """Flush and close the file, returning its filepath"""
+        if self.fmt == 'npy':
+            self.data.flush()
+            del self.table, self.data
+        else:
+            self.handle.close()
+        return self.filepath
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+3YP parallel parameter sweep module.
+Runs a scenario builder over a parameter grid on a process pool. The
+profiles are loaded once in the parent and handed to the workers
+through multiprocessing.shared_memory, and per-point KPIs are streamed
+back into a results table as points complete. With a result store,
+finished points are skipped and new ones checkpointed as they arrive.
+Authors: Mathew Hedges
+"""
+
+__version__ = '0.1'
+
+# import modules
+import csv
+import inspect
+import itertools
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import Profiles as PF
+import Assets as AS
+import Market as MK
+import Emissions as EM
+import Results as RS
+
+
+def parameterGrid(grid):
+    """
+    Expand a parameter grid into a list of points
+
+    Parameters
+    ----------
+    grid : dict or list
+        {name: list of values} for a full factorial grid, or an explicit
+        list of {name: value} points.
+
+    Returns
+    -------
+    List of {name: value} dicts
+    """
+    if isinstance(grid, dict):
+        names = list(grid)
+        return [dict(zip(names, values))
+                for values in itertools.product(*(grid[n] for n in names))]
+    return [dict(point) for point in grid]
+
+
+def defaultKpis(system, result, loss=0.08, export_rate=0.055):
+    """
+    Annual KPIs of one sweep point
+
+    Parameters
+    ----------
+    system : EnergySystem
+        The balanced energy system.
+    result : SimulationResult
+        Its energy balance result.
+    loss : float
+        Grid losses between generation and consumption.
+    export_rate : float
+        Price paid for exports (p/kWh), applied like marketObject's
+        export_rate. The 0.055 default is the scripts' grid_sale_price,
+        which they label £/kWh but the market also applies as p/kWh.
+
+    Returns
+    -------
+    dict of KPIs
+    """
+    kpis = result.getKpis()
+    kpis['emissions'] = EM.Emissions(loss).getEmissions(result['net_load'], dt=system.dt)['net']  # tnCO2
+    kpis['grid_cost'] = MK.marketObject(system, export_rate=export_rate).getGridCost().sum() / 100  # £
+    return kpis
+
+
+def shareProfiles(store=PF.store):
+    """
+    Copy the cached profiles of a store into shared memory blocks
+
+    Returns
+    -------
+    blocks : list
+        SharedMemory blocks, to be closed and unlinked by the caller.
+    specs : list
+        (key, block name, shape, dtype) needed to attach in a worker.
+    """
+    blocks, specs = [], []
+    for key, array in store.getEntries():
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs.append((key, block.name, array.shape, array.dtype.str))
+    return blocks, specs
+
+
+_attached = []
+
+
+def _attachProfiles(specs, jit=None):
+    """
+    Pool initialiser: seed the worker's profile store from shared memory
+    and fix the worker's battery kernel choice (see Assets.useJit), made
+    once from the intervals the worker will dispatch over all its points
+    rather than each point's own.
+    """
+    for key, name, shape, dtype in specs:
+        block = shared_memory.SharedMemory(name=name)
+        _attached.append(block)  # keep the mapping alive for the worker's life
+        PF.store.putEntry(key, np.ndarray(shape, np.dtype(dtype), buffer=block.buf))
+    AS.JIT = jit
+
+
+def _runPoint(task):
+    builder, kpi, params = task
+    system = builder(**params)
+    result = system.basic_energy_balance()
+    row = dict(params)
+    row.update(kpi(system, result))
+    return row
+
+
+def _runIndexed(item):
+    i, task = item
+    return i, _runPoint(task)
+
+
+def runSweep(builder, grid, kpi=defaultKpis, processes=None, out=None,
+             chunksize=1, store=None, checkpoint=50):
+    """
+    Run a scenario builder over a parameter grid in parallel
+
+    Parameters
+    ----------
+    builder : callable
+        Module level function taking the point's parameters as keywords
+        and returning an EnergySystem, e.g. Scenarios.dsr2050.
+    grid : dict or list
+        Parameter grid, see parameterGrid.
+    kpi : callable
+        Module level function (system, result) -> dict of KPIs.
+    processes : int
+        Pool size, defaults to the number of cores.
+    out : str
+        Optional CSV filepath, rewritten with the points already in the
+        store and then appended to as points complete.
+    chunksize : int
+        Points sent to a worker at a time.
+    store : Results.ResultStore
+        Optional result store of the builder, its scenario must be the
+        builder's name. Points already in it are skipped and new
+        results are committed to it every checkpoint points, so an
+        interrupted sweep resumes where it stopped.
+    checkpoint : int
+        Number of completed points between store commits.
+
+    Returns
+    -------
+    results : DataFrame
+        One row per point with its parameters and KPIs, in grid order.
+    """
+    import pandas as pd
+    if store is not None and store.scenario != builder.__name__:
+        raise ValueError("store holds '%s' results, not '%s'; open it with "
+                         "ResultStore(filepath, scenario='%s')"
+                         % (store.scenario, builder.__name__, builder.__name__))
+    points = parameterGrid(grid)
+    param_names = list(points[0])
+    names = inspect.signature(builder).parameters
+    unknown = sorted(set().union(*points) - set(names))
+    if unknown:
+        raise TypeError("%s() has no parameter(s) %s"
+                        % (builder.__name__, ', '.join(unknown)))
+    keys = [RS.pointKey(p, store.scenario) if store is not None else None
+            for p in points]
+    done = store.get(keys) if store is not None else {}
+    todo = [i for i, key in enumerate(keys) if key not in done]
+    rows = [done.get(key) for key in keys]
+
+    writer = None
+    handle = open(out, 'w', newline='') if out else None
+
+    def writeRow(row):
+        nonlocal writer
+        if handle is None:
+            return
+        if writer is None:
+            writer = csv.DictWriter(handle, fieldnames=list(row),
+                                    extrasaction='ignore')
+            writer.writeheader()
+        writer.writerow(row)
+        handle.flush()
+
+    for row in rows:                                            # points resumed from the store
+        if row is not None:
+            writeRow(row)
+    if not todo:
+        if handle is not None:
+            handle.close()
+        return pd.DataFrame(rows)
+
+    # load every profile once in the parent before sharing it
+    system = builder(**points[todo[0]])
+    kpi(system, system.basic_energy_balance())
+    blocks, specs = shareProfiles()
+    per_worker = -(-len(todo) // (processes or mp.cpu_count()))
+    jit = AS.useJit(per_worker * system.T * len(system.dispat))
+
+    pending = []
+    try:
+        with mp.Pool(processes, initializer=_attachProfiles,
+                     initargs=(specs, jit)) as pool:
+            tasks = [(i, (builder, kpi, points[i])) for i in todo]
+            for i, row in pool.imap_unordered(_runIndexed, tasks, chunksize):
+                rows[i] = row
+                writeRow(row)
+                if store is not None:
+                    pending.append(row)
+                    if len(pending) >= checkpoint:
+                        store.put(pending, param_names)
+                        pending = []
+    finally:
+        if store is not None:
+            store.put(pending, param_names)
+        if handle is not None:
+            handle.close()
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    # the 3YP_2050_DSR.py proportion sweep, top responders
+    import Scenarios as SC
+    p_array = [i/100 for i in range(1, 101, 5)]
+    store = RS.ResultStore('sweeps.sqlite', scenario='dsr2050')
+    results = runSweep(SC.dsr2050, {'prop_top': p_array, 'prop_bottom': [0]},
+                       store=store, checkpoint=5)
+    print(results)
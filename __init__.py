@@ -3,5 +3,34 @@
 """
 Created on Thu Nov  5 12:24:28 2020
 
+3YP energy system model package. Submodules are imported on first
+attribute access, e.g. package.Market, so importing the package costs
+nothing until a module is actually used. The modules import each other
+by top level name (import Assets as AS), so as before this folder must
+be on the path, e.g. the working directory; the package leaves sys.path
+alone.
+
 @author: scotwheeler
 """
+
+import importlib
+
+_MODULES = ('Assets', 'Averaging', 'Dispatch', 'Emissions', 'EnergySystem',
+            'Market', 'Plotting', 'Profiles', 'Results', 'Run', 'Scenarios',
+            'Screening', 'Streaming', 'Sweep')
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    if name in _MODULES:
+        # the top level module itself, so caches such as Profiles.store
+        # are shared with code importing it directly
+        module = importlib.import_module(name)
+        globals()[name] = module
+        return module
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_MODULES))